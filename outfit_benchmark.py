@@ -0,0 +1,515 @@
+"""Leistungsmessungen für den Outfit-Generator (ohne Fenster)
+
+Beispiele:
+    python outfit_benchmark.py wardrobe /tmp/kleiderschrank --items 200 --formats jpg,png
+    python outfit_benchmark.py run --wardrobe /tmp/kleiderschrank --json neu.json
+    python outfit_benchmark.py run --items 50 --json alt.json   # Kleiderschrank wird temporär erzeugt
+    python outfit_benchmark.py compare alt.json neu.json
+    python outfit_benchmark.py decode --images ~/Pictures/Top --repeat 10
+    python outfit_benchmark.py load --requests 5000 --concurrency 50   # startet einen eigenen Server
+    python outfit_benchmark.py load --url http://127.0.0.1:8765 --path /outfit.png
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import PIL
+
+from PIL import Image, ImageDraw
+
+import outfit_colors
+import outfit_core
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def decode_full(image_path, max_width=outfit_core.SLOT_WIDTH, max_height=outfit_core.SLOT_HEIGHT):
+    """Alter Weg: volle Auflösung dekodieren, danach verkleinern"""
+    image = Image.open(image_path).convert('RGBA')
+    image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS, reducing_gap=None)
+    return image
+
+
+DECODERS = {
+    'full': decode_full,
+    'reduced': outfit_core.open_reduced,
+}
+
+
+def make_photo(path, size, rng, white_background=True, orientation=1):
+    """Erzeugt ein Kleidungsstück-Foto: Form auf (meist) weißem Hintergrund"""
+    width, height = size
+    background = (255, 255, 255) if white_background else tuple(rng.randrange(256) for _ in range(3))
+    image = Image.new('RGB', size, background)
+    draw = ImageDraw.Draw(image)
+    color = tuple(rng.randrange(200) for _ in range(3))
+    draw.rounded_rectangle((width // 5, height // 6, width * 4 // 5, height * 5 // 6),
+                           radius=min(size) // 10, fill=color)
+    for _ in range(6):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randrange(min(size) // 20 + 1, min(size) // 6 + 2)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    
+    kwargs = {}
+    if orientation != 1:
+        exif = Image.Exif()
+        exif[outfit_core.EXIF_ORIENTATION] = orientation
+        kwargs['exif'] = exif
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        kwargs['quality'] = 90
+    if path.lower().endswith('.gif'):
+        image = image.convert('P', palette=Image.Palette.ADAPTIVE)
+    image.save(path, **kwargs)
+
+
+def percentiles(values):
+    """Kennzahlen einer Messreihe in Millisekunden"""
+    ordered = sorted(values)
+    
+    def pick(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+    
+    return {'count': len(ordered), 'mean': statistics.fmean(ordered), 'p50': pick(0.5),
+            'p90': pick(0.9), 'p99': pick(0.99), 'max': ordered[-1]}
+
+
+def time_calls(function, items, repeat):
+    """Misst jeden Aufruf einzeln (Millisekunden)"""
+    timings = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            function(item)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def peak_rss():
+    """Höchster bisheriger Arbeitsspeicher dieses Prozesses in Bytes (None wenn unbekannt)"""
+    # VmHWM beginnt nach exec neu, ru_maxrss übernimmt unter Linux den Wert des Elternprozesses
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # Linux meldet Kilobyte, macOS Bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def _peak_memory_job(job):
+    """Zusätzlicher Spitzenspeicher beim Dekodieren (läuft in einem frischen Prozess)"""
+    decoder_name, paths = job
+    decoder = DECODERS[decoder_name]
+    Image.init()  # Bildformate laden, bevor gemessen wird
+    before = peak_rss()
+    for path in paths:
+        decoder(path)
+    after = peak_rss()
+    return after - before if before is not None else None
+
+
+def peak_memory(decoder_name, paths):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(_peak_memory_job, ((decoder_name, paths),))
+
+
+def run_decode(args):
+    """Vergleicht das Dekodieren in voller Auflösung mit dem verkleinerten Dekodieren"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.images:
+            index = outfit_core.WardrobeIndex()
+            paths = [path for folder in args.images for path in index.all_images(folder)]
+        else:
+            rng = random.Random(args.seed)
+            paths = []
+            for number in range(args.count):
+                path = os.path.join(temp_dir, f"photo_{number}.jpg")
+                make_photo(path, (args.width, args.height), rng, orientation=6 if number % 4 == 0 else 1)
+                paths.append(path)
+        if not paths:
+            print("Keine Bilder gefunden", file=sys.stderr)
+            return 1
+        
+        results = {}
+        for name, decoder in DECODERS.items():
+            results[name] = percentiles(time_calls(decoder, paths, args.repeat))
+            results[name]['peak_bytes'] = peak_memory(name, paths)
+    
+    print(f"{len(paths)} Bilder, {args.repeat} Durchläufe")
+    for name, result in results.items():
+        peak = result['peak_bytes']
+        peak_text = f"{peak / 1024 / 1024:7.1f} MB" if peak is not None else "      -"
+        print(f"  {name:8s} p50 {result['p50']:8.2f} ms   p90 {result['p90']:8.2f} ms   Spitzenspeicher {peak_text}")
+    print(f"  Beschleunigung (p50): {results['full']['p50'] / results['reduced']['p50']:.1f}x")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'decode', 'images': len(paths), 'results': results}, f, indent=2)
+    return 0
+
+
+def parse_resolution(value):
+    width, sep, height = value.lower().partition('x')
+    try:
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Erwartet BREITExHÖHE, z.B. 1600x1200")
+
+
+def make_wardrobe(root, items=20, resolution=(1600, 1200), formats=('jpg', 'png', 'gif', 'bmp'),
+                  white_ratio=0.8, depth=1, filler_dirs=5, seed=1):
+    """Erzeugt einen künstlichen Kleiderschrank mit allen Kategorie-Ordnern
+    
+    Die Kategorie-Ordner liegen depth Ebenen unter root, auf jeder Ebene
+    liegen zusätzlich filler_dirs leere Ordner, die die Suche durchlaufen muss.
+    """
+    rng = random.Random(seed)
+    parent = root
+    for level in range(depth):
+        for number in range(filler_dirs):
+            os.makedirs(os.path.join(parent, f"ordner_{level}_{number}"), exist_ok=True)
+        parent = os.path.join(parent, f"ebene_{level}")
+    
+    folders = {}
+    for category in outfit_core.CATEGORIES:
+        folder = os.path.join(parent, outfit_core.FOLDER_NAMES[category][0])
+        os.makedirs(folder, exist_ok=True)
+        for number in range(items):
+            image_format = formats[rng.randrange(len(formats))]
+            path = os.path.join(folder, f"{category}_{number:05d}.{image_format}")
+            make_photo(path, resolution, rng, white_background=rng.random() < white_ratio,
+                       orientation=6 if image_format == 'jpg' and rng.random() < 0.1 else 1)
+        folders[category] = folder
+    return folders
+
+
+# Kleiderschrank-Größe für die Messung der Farb-Abstimmung (Bilder je Platz)
+COORDINATED_SIZES = {'top': 2000, 'layer': 500, 'bottom': 1000, 'shoes': 300}
+
+
+class FeatureTable:
+    """Ersatz für den Katalog mit zufälligen Farbmerkmalen (nur für die Bewertung)"""
+    
+    version = 0
+    
+    def __init__(self, sizes=COORDINATED_SIZES, seed=1):
+        np = outfit_colors.np
+        generator = np.random.default_rng(seed)
+        self.rows = {}
+        for slot, count in sizes.items():
+            features = generator.dirichlet(np.full(outfit_colors.FEATURE_SIZE, 0.3), count).astype(np.float32)
+            self.rows[slot] = ([f"{slot}_{number:05d}" for number in range(count)],
+                               [row.tobytes() for row in features])
+    
+    def feature_rows(self, folder):
+        return self.rows[folder]
+
+
+def run_stages(root, repeat=3, seed=1, depth=1, outfits=20):
+    """Misst alle Stufen einzeln (Millisekunden je Aufruf)"""
+    settings = outfit_core.thumbnail_settings()
+    max_width, max_height, threshold, fill, transparent = settings
+    stages = {}
+    
+    # Ordnersuche (ohne Cache, jedes Mal von vorn)
+    found = {}
+    
+    def discover(_):
+        found.update(outfit_core.find_folders([root], max_depth=max(3, depth + 1)))
+    
+    stages['discovery'] = time_calls(discover, [None], repeat)
+    folders = {category: folder for category, folder in found.items() if folder}
+    
+    # Einlesen der Bilderlisten (frischer Index je Ordner)
+    stages['listing'] = time_calls(outfit_core.FolderIndex, list(folders.values()), repeat)
+    index = outfit_core.WardrobeIndex()
+    paths = [path for folder in folders.values() for path in index.all_images(folder)]
+    
+    # Dekodieren, Verkleinern und Hintergrund-Entfernung getrennt
+    decoded = [outfit_core.decode_draft(path, max_width, max_height) for path in paths]
+    thumbnails = [outfit_core.fit_thumbnail(image.copy(), max_width, max_height) for image in decoded]
+    stages['decode'] = time_calls(lambda path: outfit_core.decode_draft(path, max_width, max_height),
+                                  paths, repeat)
+    stages['thumbnail'] = time_calls(lambda image: outfit_core.fit_thumbnail(image.copy(), max_width, max_height),
+                                     decoded, repeat)
+    stages['background_removal'] = time_calls(
+        lambda image: outfit_core.remove_white_background(image, threshold, fill, transparent),
+        thumbnails, repeat)
+    
+    # Ganzes Outfit ohne Tk: Auswahl, alle Bilder laden (ohne Cache) und zusammensetzen
+    slots = outfit_core.outfit_slots(folders)
+    rng = random.Random(seed)
+    stages['outfit'] = time_calls(
+        lambda _: outfit_core.render_outfit(outfit_core.choose_outfit(slots, index, rng), settings),
+        range(outfits), repeat)
+    
+    # Farblich abgestimmte Auswahl in großem Kleiderschrank (nur Bewertung, ohne Bilder)
+    if outfit_colors.np is not None:
+        coordinator = outfit_colors.ColorCoordinator(FeatureTable(seed=seed))
+        feature_slots = tuple((slot, slot) for slot in COORDINATED_SIZES)
+        coordinator.choose_outfit(feature_slots, rng)  # Matrizen einmal aufbauen
+        stages['coordinated_choice'] = time_calls(
+            lambda _: coordinator.choose_outfit(feature_slots, rng), range(outfits), repeat)
+    
+    return {name: percentiles(timings) for name, timings in stages.items()}
+
+
+def environment():
+    return {'python': platform.python_version(), 'pillow': PIL.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count()}
+
+
+def run_suite(args):
+    """Erzeugt (falls nötig) einen Kleiderschrank und misst alle Stufen"""
+    config = {key: getattr(args, key) for key in ('items', 'formats', 'white_ratio', 'depth', 'repeat', 'seed')}
+    config['resolution'] = list(args.resolution)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = args.wardrobe
+        if root is None:
+            root = temp_dir
+            make_wardrobe(root, args.items, args.resolution, args.formats, args.white_ratio,
+                          args.depth, seed=args.seed)
+        config['wardrobe'] = args.wardrobe
+        stages = run_stages(root, args.repeat, args.seed, args.depth)
+    
+    result = {'benchmark': 'suite', 'time': time.time(), 'environment': environment(),
+              'config': config, 'stages': stages}
+    print_stages(stages)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+def print_stages(stages):
+    print(f"{'Stufe':20s} {'Anzahl':>7s} {'p50 ms':>10s} {'p90 ms':>10s} {'p99 ms':>10s}")
+    for name, result in stages.items():
+        print(f"{name:20s} {result['count']:7d} {result['p50']:10.3f} {result['p90']:10.3f} {result['p99']:10.3f}")
+
+
+def compare_runs(old, new, threshold=0.10):
+    """Vergleicht zwei Messungen; gibt (Zeilen, Liste der verschlechterten Stufen) zurück"""
+    rows, regressions = [], []
+    for name in old['stages'].keys() | new['stages'].keys():
+        before, after = old['stages'].get(name), new['stages'].get(name)
+        if before is None or after is None:
+            rows.append((name, before, after, None, 'fehlt'))
+            continue
+        change = after['p50'] / before['p50'] - 1 if before['p50'] else 0.0
+        status = 'ok'
+        if change > threshold:
+            status = 'LANGSAMER'
+            regressions.append(name)
+        elif change < -threshold:
+            status = 'schneller'
+        rows.append((name, before, after, change, status))
+    return sorted(rows, key=lambda row: row[0]), regressions
+
+
+def run_compare(args):
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    if old.get('config') != new.get('config'):
+        print("Achtung: die Messungen wurden mit unterschiedlichen Einstellungen erstellt", file=sys.stderr)
+    
+    rows, regressions = compare_runs(old, new, args.threshold)
+    print(f"{'Stufe':20s} {'alt p50':>10s} {'neu p50':>10s} {'Änderung':>9s}")
+    for name, before, after, change, status in rows:
+        if change is None:
+            print(f"{name:20s} {'':>10s} {'':>10s} {'':>9s}  {status}")
+        else:
+            print(f"{name:20s} {before['p50']:10.3f} {after['p50']:10.3f} {change:+9.1%}  {status}")
+    return 1 if regressions else 0
+
+
+async def _load_connection(host, port, targets, count, timings, statuses, follow=True):
+    """Schickt count Anfragen nacheinander über eine Keep-Alive-Verbindung
+    
+    Mit follow werden wie auf der Webseite danach die Vorschaubilder eines JSON-Outfits abgerufen.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    pending = []
+    try:
+        for number in range(count):
+            target = pending.pop() if pending else targets[number % len(targets)]
+            start = time.perf_counter()
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+            head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+            length = 0
+            for line in head[1:]:
+                name, _, value = line.partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            body = await reader.readexactly(length)
+            timings.append((time.perf_counter() - start) * 1000)
+            status = int(head[0].split(' ')[1])
+            statuses[status] = statuses.get(status, 0) + 1
+            if follow and status == 200 and body.startswith(b'{"outfit"'):
+                pending = [item['thumbnail'] for item in json.loads(body)['outfit'].values() if item]
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, targets, requests=2000, concurrency=50, follow=True):
+    """Misst Durchsatz und Antwortzeiten bei gleichzeitigen Verbindungen"""
+    timings, statuses = [], {}
+    counts = [requests // concurrency + (number < requests % concurrency) for number in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_connection(host, port, targets[number % len(targets):] + targets[:number % len(targets)],
+                                            count, timings, statuses, follow)
+                           for number, count in enumerate(counts) if count))
+    elapsed = time.perf_counter() - start
+    return {'requests': len(timings), 'seconds': elapsed, 'requests_per_second': len(timings) / elapsed,
+            'statuses': statuses, 'latency': percentiles(timings)}
+
+
+def wait_for_port(host, port, process, timeout=60.0):
+    """Wartet, bis der Server Verbindungen annimmt"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server wurde beendet (Status {process.returncode})")
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server antwortet nicht")
+
+
+def free_port(host):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def run_load(args):
+    """Lasttest gegen einen laufenden Server oder einen eigenen auf einem künstlichen Kleiderschrank"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        server = None
+        paths = args.path or ['/outfit']
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+            if not args.path and url.path not in ('', '/'):
+                paths = [url.path + (f"?{url.query}" if url.query else '')]
+        else:
+            folders = make_wardrobe(temp_dir, args.items, args.resolution, args.formats, args.white_ratio,
+                                    args.depth, seed=args.seed)
+            host, port = '127.0.0.1', free_port('127.0.0.1')
+            command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'outfit_server.py'),
+                       '--host', host, '--port', str(port), '--no-cache']
+            for category, folder in folders.items():
+                command += ['--folder', f"{category}={folder}"]
+            server = subprocess.Popen(command)
+        try:
+            if server is not None:
+                wait_for_port(host, port, server)
+            result = asyncio.run(load_test(host, port, paths, args.requests,
+                                           args.concurrency, not args.no_follow))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+    
+    latency = result['latency']
+    print(f"{result['requests']} Anfragen in {result['seconds']:.2f} s: {result['requests_per_second']:.0f} pro Sekunde")
+    print(f"  Antwortzeit p50 {latency['p50']:.2f} ms   p90 {latency['p90']:.2f} ms   p99 {latency['p99']:.2f} ms")
+    print(f"  Status: {', '.join(f'{status} x{count}' for status, count in sorted(result['statuses'].items()))}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'load', 'environment': environment(), 'result': result}, f, indent=2)
+    return 0 if set(result['statuses']) == {200} else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Leistungsmessungen für den Outfit-Generator")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    def add_wardrobe_options(command):
+        command.add_argument('--items', type=int, default=20, help="Bilder pro Kategorie")
+        command.add_argument('--resolution', type=parse_resolution, default=(1600, 1200),
+                             help="Auflösung der Bilder, z.B. 4000x3000")
+        command.add_argument('--formats', type=lambda value: tuple(value.split(',')),
+                             default=('jpg', 'png', 'gif', 'bmp'), help="Bildformate, z.B. jpg,png")
+        command.add_argument('--white-ratio', type=float, default=0.8,
+                             help="Anteil der Bilder mit weißem Hintergrund")
+        command.add_argument('--depth', type=int, default=1, help="Ordnertiefe der Kategorie-Ordner")
+        command.add_argument('--seed', type=int, default=1)
+    
+    wardrobe = commands.add_parser('wardrobe', help="Künstlichen Kleiderschrank erzeugen")
+    wardrobe.add_argument('root', help="Zielordner")
+    add_wardrobe_options(wardrobe)
+    wardrobe.set_defaults(run=lambda args: print(json.dumps(make_wardrobe(
+        args.root, args.items, args.resolution, args.formats, args.white_ratio, args.depth, seed=args.seed),
+        indent=2)) or 0)
+    
+    run = commands.add_parser('run', help="Alle Stufen messen")
+    run.add_argument('--wardrobe', help="Vorhandenen Kleiderschrank verwenden statt einen zu erzeugen")
+    run.add_argument('--repeat', type=int, default=3, help="Durchläufe pro Stufe")
+    run.add_argument('--json', help="Ergebnisse als JSON speichern")
+    add_wardrobe_options(run)
+    run.set_defaults(run=run_suite)
+    
+    compare = commands.add_parser('compare', help="Zwei JSON-Ergebnisse vergleichen")
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.10,
+                         help="Ab dieser relativen Verschlechterung (p50) gilt eine Stufe als langsamer")
+    compare.set_defaults(run=run_compare)
+    
+    decode = commands.add_parser('decode', help="Volles gegen verkleinertes Dekodieren vergleichen")
+    decode.add_argument('--images', action='append', metavar='ORDNER',
+                        help="Echte Bilder aus diesem Ordner verwenden (mehrfach möglich)")
+    decode.add_argument('--count', type=int, default=8, help="Anzahl künstlicher Fotos")
+    decode.add_argument('--width', type=int, default=4000, help="Breite der künstlichen Fotos")
+    decode.add_argument('--height', type=int, default=3000, help="Höhe der künstlichen Fotos")
+    decode.add_argument('--repeat', type=int, default=3, help="Durchläufe pro Bild")
+    decode.add_argument('--seed', type=int, default=1)
+    decode.add_argument('--json', help="Ergebnisse zusätzlich als JSON speichern")
+    decode.set_defaults(run=run_decode)
+    
+    load = commands.add_parser('load', help="Lasttest für den Outfit-Server")
+    load.add_argument('--url', help="Laufenden Server testen (sonst wird ein eigener gestartet); "
+                                    "Pfad und Parameter gelten als Adresse, wenn --path fehlt")
+    load.add_argument('--path', action='append', metavar='ADRESSE',
+                      help="Abgefragte Adresse (Standard /outfit), z.B. /outfit.png?layer=0 (mehrfach möglich)")
+    load.add_argument('--requests', type=int, default=2000, help="Anzahl Anfragen")
+    load.add_argument('--concurrency', type=int, default=50, help="Gleichzeitige Verbindungen")
+    load.add_argument('--no-follow', action='store_true',
+                      help="Vorschaubilder aus JSON-Antworten nicht nachladen")
+    load.add_argument('--json', help="Ergebnisse zusätzlich als JSON speichern")
+    add_wardrobe_options(load)
+    load.set_defaults(run=run_load)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
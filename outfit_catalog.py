@@ -0,0 +1,403 @@
+"""SQLite-Katalog der Kleiderschrank-Bilder mit vorberechneten Merkmalen
+
+Jedes Bild wird genau einmal analysiert (Größe, Änderungszeit, Abmessungen,
+Inhalts-Hash, Wahrnehmungs-Hash, Hauptfarben, Anteil weißer Hintergrund). Danach
+arbeiten Auswahl und Filter nur noch mit indizierten Abfragen statt mit dem
+Dateisystem. Als Duplikat markierte Bilder (outfit_dedupe.py) werden nie ausgewählt.
+
+Beispiel:
+    python outfit_catalog.py            # Ordner suchen und Katalog abgleichen
+"""
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import outfit_colors
+import outfit_core
+
+# Katalog-Datenbank neben den anderen Caches
+CATALOG_FILE = os.path.join(os.path.expanduser("~"), ".outfit_generator", "catalog.sqlite3")
+
+# Ab so vielen neuen Bildern lohnt sich der Prozess-Pool
+POOL_THRESHOLD = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    folder TEXT NOT NULL,
+    category TEXT,
+    position INTEGER,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    content_hash TEXT,
+    colors TEXT,
+    white_fraction REAL,
+    features BLOB,
+    phash INTEGER,
+    duplicate_of TEXT
+);
+CREATE INDEX IF NOT EXISTS items_folder_position ON items (folder, position);
+CREATE INDEX IF NOT EXISTS items_category ON items (category);
+CREATE TABLE IF NOT EXISTS folders (
+    folder TEXT PRIMARY KEY,
+    category TEXT,
+    mtime_ns INTEGER
+);
+"""
+
+
+def file_hash(image_path, chunk_size=1024 * 1024):
+    """Inhalts-Hash der Datei (erkennt gleiche Bilder unter anderem Namen)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dominant_colors(image, count=3, threshold=240):
+    """Häufigste Farben ohne den weißen Hintergrund als '#rrggbb', häufigste zuerst"""
+    quantized = image.convert('RGB').quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+    palette = quantized.getpalette()
+    colors = []
+    for _, index in sorted(quantized.getcolors(), reverse=True):
+        r, g, b = palette[3 * index:3 * index + 3]
+        if min(r, g, b) > threshold:
+            continue
+        colors.append(f"#{r:02x}{g:02x}{b:02x}")
+        if len(colors) == count:
+            break
+    return colors
+
+
+def white_fraction(image, threshold=240):
+    """Anteil der weißen Pixel (0.0 bis 1.0)"""
+    mask = outfit_core.white_mask(image, threshold)
+    return mask.histogram()[255] / (mask.width * mask.height)
+
+
+def perceptual_hash(image):
+    """64-Bit-Differenz-Hash (dHash): bleibt bei Neuaufnahmen, Bearbeitungen und anderem Format fast gleich"""
+    if image.mode == 'RGBA':
+        image = Image.alpha_composite(Image.new('RGBA', image.size, (255, 255, 255, 255)), image)
+    pixels = image.convert('L').resize((9, 8), Image.Resampling.BOX).tobytes()
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] < pixels[row * 9 + column + 1])
+    # SQLite speichert nur vorzeichenbehaftete 64-Bit-Zahlen
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def analyze_image(job):
+    """Alle Merkmale eines Bildes (läuft in einem eigenen Prozess); None bei Fehlern"""
+    image_path, size, mtime_ns = job
+    try:
+        with Image.open(image_path) as image:
+            width, height = image.size
+            if image.getexif().get(outfit_core.EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                width, height = height, width
+        # Farben und Weißanteil reichen in kleiner Auflösung
+        small = outfit_core.open_reduced(image_path, 64, 64)
+        return (image_path, size, mtime_ns, width, height, file_hash(image_path),
+                json.dumps(dominant_colors(small)), white_fraction(small), outfit_colors.color_features(small),
+                perceptual_hash(small))
+    except Exception as e:
+        print(f"Fehler beim Analysieren des Bildes {image_path}: {e}")
+        return None
+
+
+def scan_folder(folder_path, extensions=outfit_core.IMAGE_EXTENSIONS):
+    """Bilder eines Ordners mit Größe und Änderungszeit (Pfad -> (size, mtime_ns))"""
+    files = {}
+    try:
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                if entry.name.lower().endswith(extensions) and entry.is_file():
+                    info = entry.stat()
+                    files[entry.path] = (info.st_size, info.st_mtime_ns)
+    except OSError:
+        pass
+    return files
+
+
+class Catalog:
+    """Bilder-Katalog in SQLite; gleiche Schnittstelle wie WardrobeIndex für die Auswahl"""
+    
+    def __init__(self, path=CATALOG_FILE, extensions=outfit_core.IMAGE_EXTENSIONS, poll_interval=2.0):
+        self.path = path
+        self.extensions = extensions
+        self.poll_interval = poll_interval  # Sekunden zwischen zwei Prüfungen eines Ordners
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._migrate()
+        self._lock = threading.RLock()          # Datenbankzugriffe
+        self._ingest_lock = threading.Lock()    # nur ein Abgleich gleichzeitig
+        self.last_check = {}
+        self.refreshing = set()  # Ordner, die gerade im Hintergrund abgeglichen werden
+        self.version = 0  # erhöht bei jeder Änderung des Inhalts
+        self.counts = dict(self.db.execute(
+            "SELECT folder, COUNT(*) FROM items WHERE position IS NOT NULL GROUP BY folder"))
+        self.known_folders = {row[0] for row in self.db.execute("SELECT folder FROM folders")}
+    
+    def _migrate(self):
+        # Ältere Kataloge: fehlende Spalten anlegen und Bilder bei neuen Merkmalen neu analysieren lassen
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(items)")}
+        for column, kind, reanalyze in (('features', 'BLOB', True), ('phash', 'INTEGER', True),
+                                        ('duplicate_of', 'TEXT', False)):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE items ADD COLUMN {column} {kind}")
+                if reanalyze:
+                    self.db.execute("UPDATE items SET mtime_ns = -1")
+        self.db.commit()
+    
+    def close(self):
+        with self._lock:
+            self.db.close()
+    
+    def has_folder(self, folder_path):
+        """Wurde der Ordner schon einmal abgeglichen?"""
+        return folder_path in self.known_folders
+    
+    def ingest(self, folders, workers=None, progress=None):
+        """Gleicht den Katalog mit den Ordnern ab (Kategorie -> Ordner)
+        
+        Nur neue und geänderte Bilder werden analysiert, bei vielen auf allen Kernen.
+        Rückgabe: (analysiert, entfernt)
+        """
+        with self._ingest_lock:
+            jobs, stale, touched, owners = [], [], [], {}
+            for category, folder in folders.items():
+                if not folder:
+                    continue
+                try:
+                    folder_mtime = os.stat(folder).st_mtime_ns
+                except OSError:
+                    folder_mtime = None
+                on_disk = scan_folder(folder, self.extensions)
+                with self._lock:
+                    known = {path: (size, mtime_ns) for path, size, mtime_ns in self.db.execute(
+                        "SELECT path, size, mtime_ns FROM items WHERE folder = ?", (folder,))}
+                    self.db.execute("UPDATE items SET category = ? WHERE folder = ?", (category, folder))
+                    # Kategorie schon jetzt, die Änderungszeit erst nach der Analyse (bis dahin die alte)
+                    self.db.execute("INSERT INTO folders (folder, category) VALUES (?, ?) "
+                                    "ON CONFLICT (folder) DO UPDATE SET category = excluded.category",
+                                    (folder, category))
+                    self.db.commit()
+                stale.extend((path,) for path in known if path not in on_disk)
+                touched.append((folder, folder_mtime))
+                for path, signature in sorted(on_disk.items()):
+                    if known.get(path) != signature:
+                        jobs.append((path,) + signature)
+                        owners[path] = (folder, category)
+            
+            analyzed = 0
+            for done, row in enumerate(self._analyze(jobs, workers), 1):
+                if row is not None:
+                    with self._lock:
+                        self.db.execute(
+                            "INSERT INTO items (path, folder, category, size, mtime_ns, width, height, "
+                            "content_hash, colors, white_fraction, features, phash) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                            "ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                            "width = excluded.width, height = excluded.height, content_hash = excluded.content_hash, "
+                            "colors = excluded.colors, white_fraction = excluded.white_fraction, "
+                            "features = excluded.features, phash = excluded.phash",
+                            row[:1] + owners[row[0]] + row[1:])
+                        if done % 256 == 0:
+                            self.db.commit()
+                    analyzed += 1
+                if progress:
+                    progress(done, len(jobs))
+            
+            # Entfernen und Neunummerieren in einem Schritt, damit die Auswahl nie Lücken sieht.
+            # Die Änderungszeit der Ordner erst jetzt: bricht die Analyse ab, wird sie wiederholt
+            with self._lock:
+                self._remove(stale)
+                for folder, _ in touched:
+                    self._renumber(folder)
+                self.db.executemany("UPDATE folders SET mtime_ns = ? WHERE folder = ?",
+                                    [(folder_mtime, folder) for folder, folder_mtime in touched])
+                self.db.commit()
+                if jobs or stale:
+                    self.version += 1
+                for folder, _ in touched:
+                    self.known_folders.add(folder)
+                    self.last_check[folder] = time.monotonic()
+            return analyzed, len(stale)
+    
+    def _remove(self, stale):
+        self.db.executemany("DELETE FROM items WHERE path = ?", stale)
+        # Behaltenes Original gelöscht: seine Duplikate wieder zeigen
+        self.db.executemany("UPDATE items SET duplicate_of = NULL WHERE duplicate_of = ?", stale)
+    
+    def _analyze(self, jobs, workers):
+        if len(jobs) < POOL_THRESHOLD or workers == 0:
+            return map(analyze_image, jobs)
+        return self._analyze_pool(jobs, workers)
+    
+    def _analyze_pool(self, jobs, workers):
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            yield from pool.map(analyze_image, jobs, chunksize=8)
+    
+    def _renumber(self, folder):
+        # Lückenlose Positionen 0..n-1 je Ordner erlauben Zufallsauswahl per Index; Duplikate bekommen keine
+        ids = [row[0] for row in self.db.execute(
+            "SELECT id FROM items WHERE folder = ? AND duplicate_of IS NULL ORDER BY path", (folder,))]
+        self.db.execute("UPDATE items SET position = NULL WHERE folder = ? AND duplicate_of IS NOT NULL", (folder,))
+        self.db.executemany("UPDATE items SET position = ? WHERE id = ?", list(enumerate(ids)))
+        self.counts[folder] = len(ids)
+    
+    def refresh(self, folder_path):
+        """Gleicht einen Ordner neu ab, falls sich seine Änderungszeit geändert hat
+        
+        Läuft im Thread des Aufrufers (Tk, Server) und blockiert ihn nicht: verschwundene
+        Bilder werden sofort entfernt (nur Pfade vergleichen), neue und geänderte im
+        Hintergrund analysiert. Bis dahin gelten die bisherigen Einträge.
+        """
+        self.last_check[folder_path] = time.monotonic()
+        try:
+            mtime_ns = os.stat(folder_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        with self._lock:
+            row = self.db.execute("SELECT category, mtime_ns FROM folders WHERE folder = ?",
+                                  (folder_path,)).fetchone()
+            if row is not None and row[1] == mtime_ns or folder_path in self.refreshing:
+                return False
+            self.refreshing.add(folder_path)
+        self._drop_missing(folder_path)
+        threading.Thread(target=self._refresh_in_background, args=(row[0] if row else None, folder_path),
+                         daemon=True).start()
+        return True
+    
+    def _drop_missing(self, folder_path):
+        on_disk = scan_folder(folder_path, self.extensions)
+        with self._lock:
+            stale = [(path,) for (path,) in self.db.execute("SELECT path FROM items WHERE folder = ?",
+                                                            (folder_path,)) if path not in on_disk]
+            if stale:
+                self._remove(stale)
+                self._renumber(folder_path)
+                self.db.commit()
+                self.version += 1
+    
+    def _refresh_in_background(self, category, folder_path):
+        try:
+            self.ingest({category: folder_path})
+        except (OSError, sqlite3.Error) as e:
+            print(f"Katalog konnte {folder_path} nicht abgleichen: {e}")
+        finally:
+            with self._lock:
+                self.refreshing.discard(folder_path)
+    
+    def poll(self, folder_path):
+        """Prüft den Ordner höchstens alle poll_interval Sekunden auf Änderungen"""
+        if time.monotonic() - self.last_check.get(folder_path, 0.0) >= self.poll_interval:
+            self.refresh(folder_path)
+    
+    def random_image(self, folder_path, rng=random):
+        """Zufälliges Bild per indizierter Abfrage"""
+        self.poll(folder_path)
+        with self._lock:
+            count = self.counts.get(folder_path, 0)
+            if not count:
+                return None
+            row = self.db.execute("SELECT path FROM items WHERE folder = ? AND position = ?",
+                                  (folder_path, rng.randrange(count))).fetchone()
+        return row[0] if row else None
+    
+    def all_images(self, folder_path):
+        self.poll(folder_path)
+        with self._lock:
+            return [row[0] for row in self.db.execute(
+                "SELECT path FROM items WHERE folder = ? AND position IS NOT NULL ORDER BY position", (folder_path,))]
+    
+    def folder_version(self, folder_path):
+        """Ändert sich, sobald sich der Katalog ändert"""
+        self.poll(folder_path)
+        return ('catalog', self.version)
+    
+    def feature_rows(self, folder_path):
+        """Pfade und Farbmerkmale (float32-Bytes) eines Ordners"""
+        self.poll(folder_path)
+        with self._lock:
+            rows = self.db.execute("SELECT path, features FROM items WHERE folder = ? AND features IS NOT NULL "
+                                   "AND position IS NOT NULL ORDER BY position", (folder_path,)).fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows]
+    
+    def perceptual_hashes(self):
+        """(Pfad, Ordner, Hash, Breite, Höhe, Dateigröße) aller analysierten Bilder"""
+        with self._lock:
+            return self.db.execute("SELECT path, folder, phash, width, height, size FROM items "
+                                   "WHERE phash IS NOT NULL ORDER BY folder, path").fetchall()
+    
+    def set_duplicates(self, duplicates):
+        """Markiert Duplikate (Pfad -> behaltenes Original); alle anderen werden wieder ausgewählt"""
+        with self._lock:
+            self.db.execute("UPDATE items SET duplicate_of = NULL WHERE duplicate_of IS NOT NULL")
+            self.db.executemany("UPDATE items SET duplicate_of = ? WHERE path = ?",
+                                [(original, path) for path, original in duplicates.items()])
+            for (folder,) in self.db.execute("SELECT folder FROM folders").fetchall():
+                self._renumber(folder)
+            self.db.commit()
+            self.version += 1
+    
+    def items(self, category=None):
+        """Alle Einträge (optional einer Kategorie) mit ihren Merkmalen als Dicts"""
+        query = ("SELECT path, category, size, mtime_ns, width, height, content_hash, colors, white_fraction, "
+                 "duplicate_of FROM items")
+        params = ()
+        if category is not None:
+            query += " WHERE category = ?"
+            params = (category,)
+        with self._lock:
+            rows = self.db.execute(query + " ORDER BY path", params).fetchall()
+        return [{
+            'path': path, 'category': category, 'size': size, 'mtime_ns': mtime_ns,
+            'width': width, 'height': height, 'content_hash': content_hash,
+            'colors': json.loads(colors) if colors else [], 'white_fraction': white, 'duplicate_of': duplicate_of
+        } for path, category, size, mtime_ns, width, height, content_hash, colors, white, duplicate_of in rows]
+    
+    def stats(self):
+        """Anzahl der Bilder je Kategorie"""
+        with self._lock:
+            return dict(self.db.execute("SELECT category, COUNT(*) FROM items GROUP BY category"))
+
+
+def main(argv=None):
+    search_paths = argv if argv else None
+    folders = outfit_core.discover_folders(search_paths)
+    catalog = Catalog()
+    
+    def report(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"{done}/{total} Bilder analysiert")
+    
+    start = time.perf_counter()
+    analyzed, removed = catalog.ingest(folders, progress=report)
+    print(f"Katalog abgeglichen in {time.perf_counter() - start:.1f} s: "
+          f"{analyzed} analysiert, {removed} entfernt")
+    for category, count in sorted(catalog.stats().items(), key=lambda item: str(item[0])):
+        print(f"  {category}: {count}")
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,132 @@
+"""Outfits ohne Fenster erzeugen: als JSON-Liste der Pfade oder als fertige Bilder
+
+Beispiele:
+    python outfit_cli.py -n 20 --seed 42 --manifest outfits.json
+    python outfit_cli.py -n 5000 --output-dir renders --short-bottom
+"""
+import argparse
+import contextlib
+import json
+import sys
+
+import outfit_catalog
+import outfit_colors
+import outfit_core
+import outfit_sampler
+
+
+def parse_folder(value):
+    category, sep, path = value.partition('=')
+    if not sep or category not in outfit_core.CATEGORIES:
+        raise argparse.ArgumentTypeError(
+            f"Erwartet KATEGORIE=PFAD mit KATEGORIE aus {', '.join(outfit_core.CATEGORIES)}")
+    return category, path
+
+
+def add_selection_options(parser):
+    """Optionen für Ordner und Auswahl (auch vom Outfit-Server benutzt)"""
+    parser.add_argument('--folder', action='append', type=parse_folder, default=[],
+                        metavar='KATEGORIE=PFAD', help="Ordner einer Kategorie festlegen (mehrfach möglich)")
+    parser.add_argument('--search', action='append', default=None, metavar='PFAD',
+                        help="Nur hier nach Kategorie-Ordnern suchen (mehrfach möglich)")
+    parser.add_argument('--catalog', action='store_true',
+                        help="Auswahl aus dem SQLite-Katalog (wird vorher abgeglichen)")
+    parser.add_argument('--sampler', choices=outfit_sampler.SAMPLER_MODES, default=None,
+                        help="Auswahl: random (gewichtet), shuffle (keine Wiederholung) oder recency")
+    parser.add_argument('--coordinated', action='store_true',
+                        help="Farblich abgestimmte Outfits (nutzt den Katalog, braucht NumPy)")
+
+
+def resolve_folders(explicit, search_paths=None):
+    """Ordner je Kategorie: explizit angegebene zuerst, der Rest wird gesucht"""
+    folders = dict(explicit)
+    if not all(category in folders for category in outfit_core.CATEGORIES):
+        # Fundmeldungen nicht in ein JSON auf der Standardausgabe mischen
+        with contextlib.redirect_stdout(sys.stderr):
+            found = outfit_core.discover_folders(search_paths)
+        for category, folder in found.items():
+            folders.setdefault(category, folder)
+    return folders
+
+
+def build_index(args, folders):
+    """Index für die Auswahl und choose(slots, rng) für farblich abgestimmte Outfits (sonst None)"""
+    index, choose = outfit_core.WardrobeIndex(), None
+    if args.catalog or args.coordinated:
+        index = outfit_catalog.Catalog()
+        with contextlib.redirect_stdout(sys.stderr):
+            index.ingest(folders, workers=getattr(args, 'workers', None))
+    if args.coordinated:
+        choose = outfit_colors.ColorCoordinator(index).choose_outfit
+    if args.sampler:
+        # Verlauf der Fenster-Version nicht verändern, damit --seed reproduzierbar bleibt
+        index = outfit_sampler.SamplingIndex(lambda folder, base=index: base, mode=args.sampler, history_dir=None)
+    return index, choose
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Zufällige Outfits ohne GUI generieren")
+    parser.add_argument('-n', '--count', type=int, default=1, help="Anzahl der Outfits")
+    parser.add_argument('--seed', type=int, default=None, help="Startwert für reproduzierbare Auswahl")
+    parser.add_argument('--manifest', help="JSON-Datei mit den gewählten Bildpfaden (- für Standardausgabe)")
+    parser.add_argument('--output-dir', help="Ordner für zusammengesetzte Outfit-Bilder")
+    parser.add_argument('--format', default='png', choices=['png', 'jpg', 'webp'], help="Bildformat der Outfits")
+    parser.add_argument('--workers', type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument('--no-layer', action='store_true', help="Layer ausblenden")
+    parser.add_argument('--short-top', action='store_true', help="Short Top statt Top")
+    parser.add_argument('--short-bottom', action='store_true', help="Short Bottom statt Bottom")
+    parser.add_argument('--button-up', action='store_true', help="Button Up statt Top")
+    parser.add_argument('--no-cache', action='store_true', help="Vorschaubild-Cache nicht verwenden")
+    add_selection_options(parser)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.manifest and not args.output_dir:
+        args.manifest = '-'
+    
+    folders = resolve_folders(args.folder, args.search)
+    missing = [name for name in ('top', 'bottom', 'shoes') if not folders.get(name)]
+    if missing:
+        print(f"Folgende Ordner fehlen: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    
+    slots = outfit_core.outfit_slots(folders, layer=not args.no_layer, short_top=args.short_top,
+                                     short_bottom=args.short_bottom, button_up=args.button_up)
+    if args.coordinated and outfit_colors.np is None:
+        print("--coordinated braucht NumPy (pip install numpy)", file=sys.stderr)
+        return 1
+    
+    index, choose = build_index(args, folders)
+    outfits = outfit_core.generate_outfits(args.count, slots, index=index, seed=args.seed, choose=choose)
+    
+    if args.output_dir:
+        def report(done, total):
+            if done % 100 == 0 or done == total:
+                print(f"{done}/{total} Outfits gerendert", file=sys.stderr)
+        
+        settings = outfit_core.thumbnail_settings()
+        paths = outfit_core.render_outfits(outfits, settings, args.output_dir,
+                                           cache_dir=None if args.no_cache else outfit_core.THUMBNAIL_CACHE_DIR,
+                                           workers=args.workers, image_format=args.format, progress=report)
+        for outfit, path in zip(outfits, paths):
+            outfit['image'] = path
+    
+    if args.manifest:
+        manifest = {
+            'seed': args.seed,
+            'slots': {slot: folder for slot, folder in slots},
+            'outfits': outfits
+        }
+        if args.manifest == '-':
+            json.dump(manifest, sys.stdout, indent=2, ensure_ascii=False)
+            print()
+        else:
+            with open(args.manifest, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
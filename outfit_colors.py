@@ -0,0 +1,196 @@
+"""Farblich abgestimmte Outfits: Farbmerkmale je Bild und Bewertung vieler Kombinationen auf einmal
+
+Die Merkmale (kleines Lab-Histogramm) werden beim Katalog-Abgleich nur mit PIL
+berechnet. Für die Bewertung wird NumPy gebraucht; ohne NumPy bleibt es bei der
+reinen Zufallsauswahl.
+"""
+import math
+import random
+import threading
+from array import array
+
+from PIL import ImageChops
+
+import outfit_core
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Helligkeitsstufen (dunkel, mittel, hell) x (neutral + 8 Farbtonbereiche)
+LIGHTNESS_LEVELS = 3
+HUE_SECTORS = 8
+FEATURE_SIZE = LIGHTNESS_LEVELS * (1 + HUE_SECTORS)
+
+# Stufengrenzen für a* und b* (Lab-Einheiten) und die Mitte jeder Stufe
+_AB_EDGES = (-60, -35, -18, -7, 7, 18, 35, 60)
+_AB_CENTERS = (-90, -47, -26, -12, 0, 12, 26, 47, 90)
+_AB_LEVELS = len(_AB_CENTERS)
+
+# Unterhalb dieser Buntheit zählt eine Farbe als neutral (Schwarz, Grau, Weiß, Beige)
+NEUTRAL_CHROMA = 10
+
+# Gewichte der Paare eines Outfits
+PAIR_WEIGHTS = {
+    ('top', 'bottom'): 1.0,
+    ('top', 'shoes'): 0.6,
+    ('bottom', 'shoes'): 0.6,
+    ('layer', 'top'): 1.0,
+    ('layer', 'bottom'): 0.6,
+}
+
+
+def _feature_bin(lightness, a, b):
+    chroma = math.hypot(a, b)
+    if chroma < NEUTRAL_CHROMA:
+        return lightness * (1 + HUE_SECTORS)
+    sector = int(((math.degrees(math.atan2(b, a)) + 360 / HUE_SECTORS / 2) % 360) // (360 / HUE_SECTORS))
+    return lightness * (1 + HUE_SECTORS) + 1 + sector
+
+
+# Zelle (Helligkeit, a-Stufe, b-Stufe) des PIL-Histogramms -> Merkmal
+_CELL_BINS = [_feature_bin(lightness, a, b)
+              for lightness in range(LIGHTNESS_LEVELS)
+              for a in _AB_CENTERS
+              for b in _AB_CENTERS]
+
+_LIGHTNESS_LUT = [min(value * LIGHTNESS_LEVELS // 256, LIGHTNESS_LEVELS - 1) * _AB_LEVELS * _AB_LEVELS
+                  for value in range(256)]
+_A_LUT = [sum(value - 128 >= edge for edge in _AB_EDGES) * _AB_LEVELS for value in range(256)]
+_B_LUT = [sum(value - 128 >= edge for edge in _AB_EDGES) for value in range(256)]
+
+
+def color_features(image, threshold=240):
+    """Normiertes Lab-Histogramm der Kleidung (ohne weißen Hintergrund) als float32-Bytes"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    
+    # Nur Pixel der Kleidung zählen: nicht weiß und nicht transparent
+    foreground = ImageChops.invert(outfit_core.white_mask(image, threshold))
+    if image.mode == 'RGBA':
+        foreground = ImageChops.multiply(foreground, image.getchannel('A').point(lambda value: 255 if value else 0))
+    
+    lightness, a, b = image.convert('RGB').convert('LAB').split()
+    cells = ImageChops.add(ImageChops.add(lightness.point(_LIGHTNESS_LUT), a.point(_A_LUT)), b.point(_B_LUT))
+    counts = cells.histogram(mask=foreground)
+    
+    features = [0.0] * FEATURE_SIZE
+    for cell, feature in enumerate(_CELL_BINS):
+        features[feature] += counts[cell]
+    total = sum(features)
+    if total:
+        features = [value / total for value in features]
+    else:
+        features[(LIGHTNESS_LEVELS - 1) * (1 + HUE_SECTORS)] = 1.0  # nur Hintergrund: hell und neutral
+    return array('f', features).tobytes()
+
+
+def harmony_matrix():
+    """Verträglichkeit zweier Merkmale (FEATURE_SIZE x FEATURE_SIZE)"""
+    # Abstand der Farbtöne in Bereichen: gleich, benachbart, ..., gegenüber (Komplementärfarbe)
+    hue_scores = (0.9, 0.8, 0.2, 0.4, 0.7)
+    matrix = np.empty((FEATURE_SIZE, FEATURE_SIZE), dtype=np.float32)
+    for i in range(FEATURE_SIZE):
+        lightness_i, hue_i = divmod(i, 1 + HUE_SECTORS)
+        for j in range(FEATURE_SIZE):
+            lightness_j, hue_j = divmod(j, 1 + HUE_SECTORS)
+            if hue_i == 0 or hue_j == 0:
+                score = 1.0  # Neutrale Farben passen zu allem
+            else:
+                distance = abs(hue_i - hue_j)
+                score = hue_scores[min(distance, HUE_SECTORS - distance)]
+            if lightness_i != lightness_j:
+                score += 0.1  # Hell-Dunkel-Kontrast
+            matrix[i, j] = score
+    return matrix
+
+
+class CategoryColors:
+    """Merkmals-Matrix aller Bilder eines Ordners"""
+    
+    def __init__(self, paths, features, harmony):
+        self.paths = paths
+        self.features = features           # N x FEATURE_SIZE
+        self.weighted = features @ harmony  # vorab mit der Verträglichkeit multipliziert
+    
+    def __len__(self):
+        return len(self.paths)
+
+
+class ColorCoordinator:
+    """Wählt farblich passende Outfits aus dem Katalog
+    
+    Statt alle Kombinationen zu prüfen, wird pro Outfit ein Stapel zufälliger Tops
+    gegen alle Bottoms bewertet, für die besten Paare dann alle Schuhe und zuletzt
+    der Layer. Aus den besten Kombinationen wird gewichtet gezogen.
+    """
+    
+    def __init__(self, catalog, batch=32, keep=16, temperature=0.05):
+        self.catalog = catalog
+        self.batch = batch              # zufällige Tops pro Outfit
+        self.keep = keep                # beste Kandidaten je Stufe
+        self.temperature = temperature  # kleiner = strenger, größer = abwechslungsreicher
+        self.harmony = harmony_matrix()
+        self._colors = {}
+        self._lock = threading.Lock()
+    
+    def colors(self, folder):
+        """Merkmals-Matrix eines Ordners (neu aufgebaut, wenn sich der Katalog geändert hat)"""
+        version = self.catalog.version
+        with self._lock:
+            cached = self._colors.get(folder)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        paths, blobs = self.catalog.feature_rows(folder)
+        features = np.frombuffer(b''.join(blobs), dtype=np.float32).reshape(len(paths), FEATURE_SIZE)
+        colors = CategoryColors(paths, features, self.harmony)
+        with self._lock:
+            self._colors[folder] = (version, colors)
+        return colors
+    
+    def _sample(self, scores, rng):
+        # Gewichtet (Softmax) unter den besten Kandidaten ziehen
+        count = min(self.keep, scores.size)
+        best = np.argpartition(scores, -count)[-count:]
+        weights = np.exp((scores[best] - scores[best].max()) / self.temperature)
+        return int(best[rng.choices(range(count), weights=weights.tolist())[0]])
+    
+    def choose_outfit(self, slots, rng=random):
+        """Wie outfit_core.choose_outfit, aber mit aufeinander abgestimmten Farben"""
+        folders = dict(slots)
+        colors = {slot: self.colors(folder) for slot, folder in slots if folder}
+        if any(len(colors.get(slot, ())) == 0 for slot in ('top', 'bottom', 'shoes')):
+            return outfit_core.choose_outfit(slots, self.catalog, rng)
+        top, bottom, shoes = colors['top'], colors['bottom'], colors['shoes']
+        
+        # Zufällige Tops gegen alle Bottoms, je Top die besten Bottoms behalten
+        tops = rng.sample(range(len(top)), min(self.batch, len(top)))
+        top_weighted = top.weighted[tops]
+        top_bottom = top_weighted @ bottom.features.T
+        keep = min(self.keep, len(bottom))
+        best_bottoms = np.argpartition(top_bottom, -keep, axis=1)[:, -keep:]
+        pair_scores = np.take_along_axis(top_bottom, best_bottoms, axis=1).reshape(-1, 1)
+        
+        # Diese Paare gegen alle Schuhe
+        best_bottoms = best_bottoms.ravel()
+        top_shoes = np.repeat(top_weighted @ shoes.features.T, keep, axis=0)
+        bottom_shoes = bottom.weighted[best_bottoms] @ shoes.features.T
+        scores = (PAIR_WEIGHTS[('top', 'bottom')] * pair_scores
+                  + PAIR_WEIGHTS[('top', 'shoes')] * top_shoes
+                  + PAIR_WEIGHTS[('bottom', 'shoes')] * bottom_shoes)
+        pair, shoe = divmod(self._sample(scores.ravel(), rng), len(shoes))
+        top_index, bottom_index = tops[pair // keep], int(best_bottoms[pair])
+        
+        outfit = {slot: None for slot, _ in slots}
+        outfit.update(top=top.paths[top_index], bottom=bottom.paths[bottom_index], shoes=shoes.paths[shoe])
+        
+        # Layer passend zu Top und Bottom
+        layer = colors.get('layer') if folders.get('layer') else None
+        if layer is not None and len(layer):
+            layer_scores = (PAIR_WEIGHTS[('layer', 'top')] * (layer.weighted @ top.features[top_index])
+                            + PAIR_WEIGHTS[('layer', 'bottom')] * (layer.weighted @ bottom.features[bottom_index]))
+            outfit['layer'] = layer.paths[self._sample(layer_scores, rng)]
+        elif folders.get('layer'):
+            outfit['layer'] = self.catalog.random_image(folders['layer'], rng)
+        return outfit
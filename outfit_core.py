@@ -0,0 +1,1258 @@
+"""Outfit-Auswahl und Bildverarbeitung ohne GUI (für Generator, CLI und Skripte)"""
+import os
+import random
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+import glob
+import hashlib
+import json
+import stat
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Optional: schnellere Hintergrund-Suche bei verrauschten Bildern
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Alle Kategorien in der Reihenfolge der Anzeige
+CATEGORIES = ('top', 'layer', 'bottom', 'shoes', 'short_top', 'short_bottom', 'button_up')
+
+# Ohne diese Kategorien lässt sich kein Outfit erzeugen
+REQUIRED_CATEGORIES = ('top', 'bottom', 'shoes')
+
+# Mögliche Ordnernamen je Kategorie
+FOLDER_NAMES = {
+    'top': ['Top', 'top', 'Tops', 'tops', 'Oberteile', 'oberteile'],
+    'layer': ['Layer', 'layer', 'Layers', 'layers', 'Jacken', 'jacken', 'Hoodies', 'hoodies'],
+    'bottom': ['Bottom', 'bottom', 'Bottoms', 'bottoms', 'Hosen', 'hosen', 'Unten', 'unten'],
+    'shoes': ['Shoes', 'shoes', 'Schuhe', 'schuhe', 'Footwear', 'footwear'],
+    'short_top': ['Short Top', 'short_top', 'Short_Top', 'ShortTop', 'Kurze Oberteile', 'kurze_oberteile', 'T-Shirts', 'tshirts'],
+    'short_bottom': ['Short Bottom', 'short_bottom', 'Short_Bottom', 'ShortBottom', 'Kurze Hosen', 'kurze_hosen', 'Shorts', 'shorts'],
+    'button_up': ['Button Up', 'button_up', 'Button_Up', 'ButtonUp', 'Hemden', 'hemden', 'Shirts', 'shirts', 'Blusen', 'blusen']
+}
+
+# EXIF-Feld mit der Ausrichtung des Fotos
+EXIF_ORIENTATION = 0x0112
+
+# Version der Bildbearbeitung; bei Änderungen werden alte Cache-Einträge ungültig
+PIPELINE_VERSION = 3
+
+# Weiche Kante der Kleidung zum entfernten Hintergrund (Radius in Pixeln, 0 = harte Kante)
+EDGE_FEATHER = 1.0
+
+# Größere Bilder werden für die Hintergrund-Suche auf diese Größe gemittelt (begrenzt die Laufzeit)
+SEGMENT_SIZE = (250, 180)
+
+# Größe eines Anzeige-Platzes (wie im Generator-Fenster)
+SLOT_WIDTH = 250
+SLOT_HEIGHT = 180
+
+# Vorberechnete Größen je Bild (Pyramide); angezeigt wird aus der nächstgrößeren Stufe
+PYRAMID_LEVELS = ((125, 90), (250, 180), (500, 360), (1000, 720))
+
+# Unterstützte Bildformate (Groß-/Kleinschreibung egal)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp')
+
+# Standard-Speicherort für den Vorschaubild-Cache
+THUMBNAIL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".outfit_generator", "thumbnails")
+
+# Zuletzt gefundene Kategorie-Ordner (damit nicht bei jedem Start gesucht werden muss)
+DISCOVERY_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".outfit_generator", "folders.json")
+
+# Ordner, die bei der Suche übersprungen werden
+SKIP_DIRECTORIES = {
+    'Windows', 'Program Files', 'Program Files (x86)', 'ProgramData', 'AppData',
+    'System Volume Information', 'Library', 'node_modules', '__pycache__'
+}
+_HIDDEN_OR_SYSTEM = getattr(stat, 'FILE_ATTRIBUTE_HIDDEN', 2) | getattr(stat, 'FILE_ATTRIBUTE_SYSTEM', 4)
+
+
+class _Stage:
+    """Misst die Dauer eines with-Blocks"""
+    __slots__ = ('recorder', 'name', 'bytes', 'start')
+    active = True
+    
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+        self.bytes = 0  # Gelesene Bytes (kann im Block gesetzt werden)
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, (time.perf_counter() - self.start) * 1000, self.bytes, self.start)
+        return False
+
+
+class _NoStage:
+    """Ersatz für _Stage bei ausgeschalteter Messung (macht nichts)"""
+    __slots__ = ()
+    active = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+class PerfRecorder:
+    """Zeitmessung der einzelnen Stufen in einem Ringpuffer (ausgeschaltet fast kostenlos)"""
+    
+    def __init__(self, capacity=4096, enabled=False):
+        self.enabled = enabled
+        self.records = deque(maxlen=capacity)  # (Stufe, Start, Dauer in ms, Bytes, Thread)
+        self._lock = threading.Lock()
+    
+    def stage(self, name):
+        """with perf.stage('decode') as stage: ... (stage.bytes = gelesene Bytes)"""
+        return _Stage(self, name) if self.enabled else _NO_STAGE
+    
+    def record(self, name, duration_ms, nbytes=0, start=None):
+        if not self.enabled:
+            return
+        if start is None:
+            start = time.perf_counter() - duration_ms / 1000
+        with self._lock:
+            self.records.append((name, start, duration_ms, nbytes, threading.current_thread().name))
+    
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+    
+    def summary(self):
+        """Je Stufe: letzte Dauer, p95, Anzahl und gelesene Bytes (über den Ringpuffer)"""
+        with self._lock:
+            records = list(self.records)
+        durations, result = {}, {}
+        for name, _, duration_ms, nbytes, _ in records:
+            durations.setdefault(name, []).append(duration_ms)
+            entry = result.setdefault(name, {'last': 0.0, 'count': 0, 'bytes': 0})
+            entry['last'] = duration_ms
+            entry['count'] += 1
+            entry['bytes'] += nbytes
+        for name, values in durations.items():
+            values.sort()
+            result[name]['p95'] = values[min(len(values) - 1, int(0.95 * len(values)))]
+        return result
+    
+    def export_jsonl(self, path):
+        """Schreibt alle Messungen als JSON-Lines (eine Zeile pro Messung)"""
+        with self._lock:
+            records = list(self.records)
+        with open(path, 'w', encoding='utf-8') as f:
+            for name, start, duration_ms, nbytes, thread in records:
+                f.write(json.dumps({'stage': name, 'start': start, 'ms': duration_ms,
+                                    'bytes': nbytes, 'thread': thread}) + '\n')
+        return len(records)
+
+
+# Gemeinsame Zeitmessung (standardmäßig aus, z.B. mit OUTFIT_PERF=1 einschalten)
+perf = PerfRecorder(enabled=os.environ.get('OUTFIT_PERF') == '1')
+
+
+def _white_band_mask(r, g, b, threshold):
+    # Band-Operationen statt Schleife über jedes Pixel: alle Werte über dem Schwellenwert,
+    # d.h. der kleinste der drei
+    lut = [255 if value > threshold else 0 for value in range(256)]
+    return ImageChops.darker(ImageChops.darker(r, g), b).point(lut)
+
+
+def white_mask(image, threshold=240):
+    """Maske aller "weißen" Pixel (alle RGB-Werte über dem Schwellenwert): 255 = weiß"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    r, g, b = image.split()[:3]
+    return _white_band_mask(r, g, b, threshold)
+
+
+def border_connected(mask):
+    """Nur die weißen Bereiche (255) einer Maske, die den Bildrand berühren
+    
+    Die weißen Pixel jeder Zeile werden als Läufe gefunden (bytes.find statt Schleife
+    über Pixel) und mit überlappenden Läufen der Zeile darüber vereinigt (Union-Find,
+    4er-Nachbarschaft). Bei einem Vorschaubild sind das wenige hundert Läufe; bei
+    Rauschen oder Streifen können es zehntausende werden, dann rechnet NumPy.
+    """
+    if np is not None:
+        return _border_connected_numpy(mask)
+    width, height = mask.size
+    data = mask.tobytes()
+    starts, ends, parents = [], [], []  # Läufe als Offsets in data
+    border = []                         # Läufe am Bildrand
+    
+    def root(number):
+        while parents[number] != number:
+            parents[number] = parents[parents[number]]
+            number = parents[number]
+        return number
+    
+    above, above_end = 0, 0  # Läufe der Zeile darüber: Nummern above..above_end-1
+    last_row = len(data) - width
+    for row_start in range(0, len(data), width):
+        row_end = row_start + width
+        first = len(starts)
+        start = data.find(255, row_start, row_end)
+        while start != -1:
+            end = data.find(0, start, row_end)
+            if end == -1:
+                end = row_end
+            number = len(starts)
+            starts.append(start)
+            ends.append(end)
+            parents.append(number)
+            if start == row_start or end == row_end or row_start == 0 or row_start == last_row:
+                border.append(number)
+            # Beide Zeilen sind sortiert: above läuft nur vorwärts, jeder Lauf wird
+            # nur so oft angesehen, wie er überlappt (linear statt quadratisch)
+            while above < above_end and ends[above] + width <= start:
+                above += 1
+            other = above
+            while other < above_end and starts[other] + width < end:
+                parents[root(other)] = number  # der aktuelle Lauf ist immer noch eine Wurzel
+                other += 1
+            start = data.find(255, end, row_end)
+        above, above_end = first, len(starts)
+    
+    background = {root(number) for number in border}
+    result = bytearray(len(data))
+    for number, start in enumerate(starts):
+        if root(number) in background:
+            result[start:ends[number]] = b'\xff' * (ends[number] - start)
+    return Image.frombytes('L', mask.size, bytes(result))
+
+
+def _border_connected_numpy(mask):
+    # Wie border_connected, aber alle Läufe und Überlappungen als Arrays
+    width, height = mask.size
+    key = width + 1  # Lauf-Schlüssel Zeile * key + Spalte, nach Zeilen sortiert
+    padded = np.zeros((height, key + 1), np.int8)
+    padded[:, 1:-1] = np.frombuffer(mask.tobytes(), np.uint8).reshape(height, width) > 0
+    change = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(change == 1)
+    ends = np.nonzero(change == -1)[1]
+    if not len(rows):
+        return Image.new('L', mask.size, 0)
+    start_keys = rows * key + starts
+    end_keys = rows * key + ends
+    
+    # Überlappende Läufe der Zeile darüber: Nummern lower..upper-1 je Lauf
+    lower = np.searchsorted(end_keys, (rows - 1) * key + starts, side='right')
+    upper = np.searchsorted(start_keys, (rows - 1) * key + ends, side='left')
+    counts = np.maximum(upper - lower, 0)
+    first = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    second = np.repeat(lower, counts) + offsets
+    
+    # Zusammenhangskomponenten: Wurzeln einhängen und Pfade halbieren, bis alle Kanten verbunden sind
+    parents = np.arange(len(rows))
+    while True:
+        while True:
+            grand = parents[parents]
+            if np.array_equal(grand, parents):
+                break
+            parents = grand
+        a, b = parents[first], parents[second]
+        differ = a != b
+        if not differ.any():
+            break
+        np.minimum.at(parents, np.maximum(a[differ], b[differ]), np.minimum(a[differ], b[differ]))
+    
+    border = (rows == 0) | (rows == height - 1) | (starts == 0) | (ends == width)
+    background = np.isin(parents, parents[border])
+    edges = np.zeros(height * key + 1, np.int8)
+    edges[start_keys[background]] = 1
+    edges[end_keys[background]] = -1
+    result = np.cumsum(edges[:-1], dtype=np.int8).reshape(height, key)[:, :width]
+    return Image.frombytes('L', mask.size, (result.astype(np.uint8) * 255).tobytes())
+
+
+def foreground_mask(image, threshold=240, feather=EDGE_FEATHER):
+    """Alpha-Maske der Kleidung: 0 = mit dem Rand verbundenes Weiß, 255 = Kleidung
+    
+    Weiße Flächen mitten im Bild (weiße Shirts, Logos, Sohlen) bleiben erhalten.
+    Die Kante wird nur nach innen weich gezeichnet, damit kein heller Saum bleibt.
+    Über SEGMENT_SIZE wird der Zusammenhang verkleinert gesucht.
+    """
+    white = white_mask(image, threshold)
+    if image.width > SEGMENT_SIZE[0] or image.height > SEGMENT_SIZE[1]:
+        # Zusammenhang auf dem gemittelten Bild suchen (Rauschen mittelt sich weg), die Kante
+        # kommt aber aus der vollen Auflösung: nur dort weiße Pixel können Hintergrund sein
+        factor = max(-(-image.width // SEGMENT_SIZE[0]), -(-image.height // SEGMENT_SIZE[1]))
+        small = image.reduce(factor)
+        background = border_connected(white_mask(small, threshold)).resize(image.size, Image.Resampling.BILINEAR)
+        background = ImageChops.multiply(background.point(lambda value: 255 if value >= 128 else 0), white)
+    else:
+        background = border_connected(white)
+    alpha = ImageChops.invert(background)
+    if feather and background.getbbox():
+        alpha = ImageChops.darker(alpha, alpha.filter(ImageFilter.BoxBlur(feather)))
+    return alpha
+
+
+def remove_white_background(image, threshold=240, fill=(0, 0, 0), transparent=False, feather=EDGE_FEATHER):
+    """Entfernt weißen Hintergrund und macht ihn schwarz/transparent
+    
+    Nur weiße Bereiche, die den Bildrand berühren, gelten als Hintergrund (siehe
+    foreground_mask). Läuft auf dem verkleinerten Bild, das Ergebnis landet mit dem
+    Vorschaubild im Cache.
+    """
+    # Konvertiere zu RGBA wenn nötig
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    
+    r, g, b, a = image.split()
+    alpha = foreground_mask(image, threshold, feather)
+    if alpha.getextrema()[0] == 255:
+        return Image.merge('RGBA', (r, g, b, a))  # kein weißer Hintergrund am Rand
+    
+    # Hintergrund einfärben, an der weichen Kante gemischt
+    fill_r, fill_g, fill_b = fill
+    r = Image.composite(r, Image.new('L', image.size, fill_r), alpha)
+    g = Image.composite(g, Image.new('L', image.size, fill_g), alpha)
+    b = Image.composite(b, Image.new('L', image.size, fill_b), alpha)
+    
+    # Optional: Hintergrund zusätzlich transparent machen (ursprüngliche Alpha bleibt innen erhalten)
+    if transparent:
+        a = ImageChops.multiply(a, alpha)
+    
+    return Image.merge('RGBA', (r, g, b, a))
+
+
+def _target_box(image, max_width, max_height):
+    """Zielgröße in Datei-Ausrichtung und EXIF-Ausrichtung des Bildes"""
+    # Hochformat-Fotos liegen oft quer in der Datei und werden per EXIF gedreht
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    if orientation in (5, 6, 7, 8):
+        return (max_height, max_width), orientation
+    return (max_width, max_height), orientation
+
+
+def decode_draft(image_path, max_width=SLOT_WIDTH, max_height=SLOT_HEIGHT, reducing_gap=2.0):
+    """Dekodiert ein Bild so klein wie möglich, aber nicht kleiner als reducing_gap x Zielgröße
+    
+    JPEGs dekodiert der Decoder direkt in 1/2, 1/4 oder 1/8 der Auflösung (draft),
+    sodass die volle Kamera-Auflösung nie im Speicher liegt.
+    """
+    image = Image.open(image_path)
+    box, _ = _target_box(image, max_width, max_height)
+    image.draft('RGB', (int(box[0] * reducing_gap), int(box[1] * reducing_gap)))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    image.load()
+    return image
+
+
+def fit_thumbnail(image, max_width=SLOT_WIDTH, max_height=SLOT_HEIGHT, reducing_gap=2.0):
+    """Verkleinert ein dekodiertes Bild (reduce + LANCZOS) und dreht es laut EXIF"""
+    box, orientation = _target_box(image, max_width, max_height)
+    image.thumbnail(box, Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+    if orientation != 1:
+        image = ImageOps.exif_transpose(image)
+    return image
+
+
+def open_reduced(image_path, max_width=SLOT_WIDTH, max_height=SLOT_HEIGHT, reducing_gap=2.0):
+    """Öffnet ein Bild gleich in Anzeigegröße (richtig gedreht, höchstens max_width x max_height)
+    
+    Andere Formate als JPEG werden ganzzahlig mit reduce() verkleinert und dann
+    mit LANCZOS auf die Zielgröße gebracht.
+    """
+    image = decode_draft(image_path, max_width, max_height, reducing_gap)
+    return fit_thumbnail(image, max_width, max_height, reducing_gap)
+
+
+def prepare_thumbnail(image_path, settings):
+    """Lädt ein Bild, verkleinert es und entfernt den weißen Hintergrund"""
+    max_width, max_height, threshold, fill, transparent = settings
+    
+    # Erst verkleinern, dann nur noch die kleinen Pixel bearbeiten
+    with perf.stage('decode') as stage:
+        image = decode_draft(image_path, max_width, max_height)
+        if stage.active:
+            stage.bytes = os.path.getsize(image_path)
+    with perf.stage('thumbnail'):
+        image = fit_thumbnail(image, max_width, max_height)
+    
+    with perf.stage('remove_white_background'):
+        return remove_white_background(image, threshold, fill, transparent)
+
+
+class FolderIndex:
+    """Bilderliste eines Ordners, wird nur bei Änderungen neu eingelesen"""
+    
+    def __init__(self, folder_path, extensions=IMAGE_EXTENSIONS):
+        self.folder_path = folder_path
+        self.extensions = extensions
+        self.names = []       # Dateinamen (kompakt, ohne Ordnerpfad)
+        self.positions = {}   # Dateiname -> Index in self.names
+        self.mtime_ns = None
+        self.last_check = 0.0
+        self.generation = 0   # erhöht bei jeder Änderung der Bilderliste
+        self._lock = threading.Lock()
+        self.refresh()
+    
+    def refresh(self):
+        """Liest den Ordner neu ein, falls sich seine Änderungszeit geändert hat"""
+        with self._lock:
+            self.last_check = time.monotonic()
+            try:
+                mtime_ns = os.stat(self.folder_path).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if mtime_ns is not None and mtime_ns == self.mtime_ns:
+                return False
+            self.mtime_ns = mtime_ns
+            
+            current = set()
+            if mtime_ns is not None:
+                try:
+                    with os.scandir(self.folder_path) as it:
+                        for entry in it:
+                            if entry.name.lower().endswith(self.extensions) and entry.is_file():
+                                current.add(entry.name)
+                except OSError:
+                    pass
+            
+            # Nur die Unterschiede einarbeiten statt die Liste neu aufzubauen
+            self.generation += 1
+            for name in [name for name in self.positions if name not in current]:
+                self._remove(name)
+            for name in sorted(current):
+                if name not in self.positions:
+                    self.positions[name] = len(self.names)
+                    self.names.append(name)
+            return True
+    
+    def _remove(self, name):
+        # Letztes Element an die freie Stelle setzen (O(1))
+        index = self.positions.pop(name)
+        last = self.names.pop()
+        if index < len(self.names):
+            self.names[index] = last
+            self.positions[last] = index
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def random_image(self, rng=random):
+        """Zufälliges Bild in O(1)"""
+        with self._lock:
+            names = self.names
+            if not names:
+                return None
+            return os.path.join(self.folder_path, names[rng.randrange(len(names))])
+    
+    def all_images(self):
+        return [os.path.join(self.folder_path, name) for name in self.names]
+
+
+class WardrobeIndex:
+    """Zwischengespeicherte Bilderlisten aller Kategorie-Ordner"""
+    
+    def __init__(self, extensions=IMAGE_EXTENSIONS, poll_interval=2.0):
+        self.extensions = extensions
+        self.poll_interval = poll_interval  # Sekunden zwischen zwei Prüfungen eines Ordners
+        self.folders = {}
+        self._lock = threading.Lock()
+    
+    def folder(self, folder_path):
+        """Index eines Ordners (prüft höchstens alle poll_interval Sekunden auf Änderungen)"""
+        with self._lock:
+            index = self.folders.get(folder_path)
+            if index is None:
+                index = self.folders[folder_path] = FolderIndex(folder_path, self.extensions)
+                return index
+        if time.monotonic() - index.last_check >= self.poll_interval:
+            index.refresh()
+        return index
+    
+    def random_image(self, folder_path, rng=random):
+        return self.folder(folder_path).random_image(rng)
+    
+    def all_images(self, folder_path):
+        return self.folder(folder_path).all_images()
+    
+    def folder_version(self, folder_path):
+        """Ändert sich, sobald sich die Bilder des Ordners ändern"""
+        return ('index', self.folder(folder_path).generation)
+
+
+class ThumbnailCache:
+    """Festplatten-Cache für fertige Vorschaubilder mit LRU-Verdrängung"""
+    
+    # Kopfzeile jeder Datei: Breite und Höhe, danach rohe RGBA-Bytes
+    HEADER = struct.Struct('<II')
+    SUFFIX = '.rgba'
+    
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # wird beim ersten Schreiben ermittelt
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def entry_path(self, image_path, settings):
+        """Cache-Datei für ein Bild (Pfad, Größe, Änderungszeit und Einstellungen)"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        
+        # Pfad, Stand der Quelle und Einstellungen getrennt: beim Schreiben werden nur Einträge
+        # mit veraltetem Quell-Stand gelöscht, andere Größen (Pyramiden-Stufen) bleiben
+        path_key = hashlib.sha1(os.path.abspath(image_path).encode('utf-8')).hexdigest()[:16]
+        source = repr((PIPELINE_VERSION, stat.st_size, stat.st_mtime_ns)).encode('utf-8')
+        source_key = hashlib.sha1(source).hexdigest()[:12]
+        settings_key = hashlib.sha1(repr(settings).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{path_key}-{source_key}-{settings_key}{self.SUFFIX}")
+    
+    def load(self, entry):
+        """Liest ein Vorschaubild aus dem Cache (None wenn nicht vorhanden)"""
+        try:
+            with perf.stage('cache_read') as stage, open(entry, 'rb') as f:
+                data = f.read()
+                stage.bytes = len(data)
+        except OSError:
+            return None
+        
+        if len(data) < self.HEADER.size:
+            return None
+        width, height = self.HEADER.unpack_from(data)
+        if len(data) != self.HEADER.size + width * height * 4:
+            return None  # Beschädigter Eintrag
+        
+        # Zugriffszeit merken (für LRU)
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return Image.frombytes('RGBA', (width, height), data[self.HEADER.size:])
+    
+    def store(self, entry, image):
+        """Schreibt ein Vorschaubild und entfernt veraltete Versionen desselben Bildes"""
+        data = self.HEADER.pack(*image.size) + image.tobytes()
+        temp_path = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with perf.stage('cache_write'):
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, entry)
+        
+        # Quelle hat sich geändert -> Einträge dieses Pfads mit altem Quell-Stand löschen
+        path_key, source_key = os.path.basename(entry).split('-')[:2]
+        freed = 0
+        for old_entry in glob.glob(os.path.join(self.cache_dir, f"{path_key}-*{self.SUFFIX}")):
+            if not os.path.basename(old_entry).startswith(f"{path_key}-{source_key}-"):
+                try:
+                    freed += os.path.getsize(old_entry)
+                    os.remove(old_entry)
+                except OSError:
+                    pass
+        return len(data) - freed
+    
+    def lookup(self, image_path, settings):
+        """Vorschaubild nur aus dem Cache (None, wenn es erst erzeugt werden müsste)"""
+        entry = self.entry_path(image_path, settings)
+        return self.load(entry) if entry is not None else None
+    
+    def get(self, image_path, settings):
+        """Vorschaubild aus dem Cache holen oder erzeugen und speichern"""
+        entry = self.entry_path(image_path, settings)
+        if entry is None:
+            return prepare_thumbnail(image_path, settings)
+        
+        image = self.load(entry)
+        if image is not None:
+            return image
+        
+        image = prepare_thumbnail(image_path, settings)
+        try:
+            self.added(self.store(entry, image))
+        except OSError as e:
+            print(f"Cache konnte nicht geschrieben werden: {e}")
+        return image
+    
+    def added(self, nbytes):
+        """Verbucht neue Bytes und verdrängt bei Bedarf alte Einträge"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += nbytes
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if item.name.endswith(self.SUFFIX):
+                        stat = item.stat()
+                        entries.append((item.path, stat.st_size, stat.st_mtime))
+        except OSError:
+            pass
+        return entries
+    
+    def _evict(self):
+        """Löscht die am längsten nicht benutzten Einträge bis unter das Limit"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+
+def _warm_cache_entry(job):
+    """Erzeugt einen Cache-Eintrag (läuft in einem eigenen Prozess)"""
+    cache_dir, image_path, settings = job
+    cache = ThumbnailCache(cache_dir)
+    entry = cache.entry_path(image_path, settings)
+    if entry is None or os.path.exists(entry):
+        return 0
+    try:
+        return cache.store(entry, prepare_thumbnail(image_path, settings))
+    except Exception as e:
+        print(f"Fehler beim Laden des Bildes {image_path}: {e}")
+        return 0
+
+
+def warm_thumbnail_cache(cache, image_paths, settings, progress=None):
+    """Rendert alle Bilder parallel auf allen Kernen in den Cache vor"""
+    jobs = [(cache.cache_dir, path, settings) for path in image_paths]
+    written = 0
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        for done, nbytes in enumerate(pool.map(_warm_cache_entry, jobs, chunksize=8), 1):
+            written += nbytes
+            if progress:
+                progress(done, len(jobs))
+    cache.added(written)
+    return len(jobs)
+
+
+class MemoryLRUCache:
+    """LRU-Cache im Speicher, begrenzt durch ein Byte-Budget statt durch die Anzahl"""
+    
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.entries = OrderedDict()  # Schlüssel -> (Wert, Bytes), älteste zuerst
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key, value, nbytes):
+        """Speichert einen Wert; nbytes ist z.B. Breite * Höhe * 4 bei RGBA-Bildern"""
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return  # Passt nie ins Budget
+            self.entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, freed) = self.entries.popitem(last=False)
+                self.current_bytes -= freed
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.current_bytes = 0
+    
+    def stats(self):
+        """Zähler für Treffer, Fehlschläge und Verdrängungen"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.current_bytes, 'max_bytes': self.max_bytes}
+
+
+class OutfitPrefetcher:
+    """Hält die nächsten Outfits fertig vorbereitet (Pfade und Vorschaubilder)"""
+    
+    def __init__(self, executor, pick_outfit, load_image, depth=3, max_bytes=64 * 1024 * 1024, give_back=None):
+        self.executor = executor
+        self.pick_outfit = pick_outfit  # Zustand -> Platz -> Bildpfad
+        self.load_image = load_image    # Bildpfad -> fertiges PIL-Bild
+        self.give_back = give_back      # (Zustand, Outfit): verworfenes, nie gezeigtes Outfit
+        self.depth = depth            # Anzahl vorbereiteter Outfits
+        self.max_bytes = max_bytes    # Speicherbudget für alle vorbereiteten Bilder
+        self.state = None             # Ordner der aktiven Kategorien und Auswahl-Modus
+        self.epoch = 0                # Erhöht bei jedem Kategorie-Wechsel
+        self.queue = deque()
+        self.queued_bytes = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+    
+    def invalidate(self, state=None):
+        """Verwirft alle vorbereiteten Outfits (z.B. nach einem Kategorie-Wechsel)"""
+        with self._lock:
+            old_state, discarded = self.state, list(self.queue)
+            self.state = state
+            self.epoch += 1
+            self.queue.clear()
+            self.queued_bytes = 0
+            self.in_flight = 0
+        if self.give_back is not None:
+            for outfit in discarded:
+                self.give_back(old_state, outfit)
+    
+    def take(self, state):
+        """Nächstes fertiges Outfit für diesen Kategorie-Zustand (None wenn keins bereit)"""
+        if state != self.state:
+            self.invalidate(state)
+        with self._lock:
+            outfit = self.queue.popleft() if self.queue else None
+            if outfit:
+                self.queued_bytes -= self.outfit_bytes(outfit)
+        return outfit
+    
+    def fill(self):
+        """Startet Hintergrund-Jobs bis die Warteschlange voll ist"""
+        with self._lock:
+            if self.state is None:
+                return
+            missing = self.depth - len(self.queue) - self.in_flight
+            if self.queued_bytes >= self.max_bytes:
+                missing = 0
+            self.in_flight += max(missing, 0)
+            epoch, state = self.epoch, self.state
+        for _ in range(missing):
+            future = self.executor.submit(self.prepare, state)
+            future.add_done_callback(lambda f: self.finished(epoch, state, f))
+    
+    def prepare(self, state):
+        """Wählt ein Outfit und lädt alle Bilder (läuft im Hintergrund)"""
+        return {slot: (path, self.load_image(path) if path else None)
+                for slot, path in self.pick_outfit(state).items()}
+    
+    def finished(self, epoch, state, future):
+        if future.cancelled() or future.exception() is not None:
+            outfit = None
+        else:
+            outfit = future.result()
+        with self._lock:
+            current = epoch == self.epoch
+            if current:
+                self.in_flight -= 1
+                if outfit is not None:
+                    self.queue.append(outfit)
+                    self.queued_bytes += self.outfit_bytes(outfit)
+        # Kategorien haben sich inzwischen geändert: Outfit wird nie gezeigt
+        if not current and outfit is not None and self.give_back is not None:
+            self.give_back(state, outfit)
+    
+    @staticmethod
+    def outfit_bytes(outfit):
+        return sum(image.width * image.height * 4 for _, image in outfit.values() if image is not None)
+
+
+def pack_image(image):
+    """Kompakte Form eines Vorschaubilds (Modus, Größe, zlib-Bytes) für den Verlauf"""
+    return image.mode, image.size, zlib.compress(image.tobytes(), 1)
+
+
+def unpack_image(packed):
+    mode, size, data = packed
+    return Image.frombytes(mode, size, zlib.decompress(data))
+
+
+class HistoryEntry:
+    """Ein gezeigtes Outfit: Pfade je Platz, Daten des Aufrufers und (solange Platz ist) die Bilder"""
+    
+    def __init__(self, paths, state=None):
+        self.paths = paths  # Platz -> Bildpfad oder None
+        self.state = state  # z.B. Schalter-Stellungen, die zum Outfit gehörten
+        self.images = {}    # Platz -> (Schlüssel, Bild oder gepacktes Bild, Bytes)
+        self.nbytes = 0
+
+
+class OutfitHistory:
+    """Verlauf der gezeigten Outfits mit Zurück/Vor
+    
+    Die neuesten image_entries Outfits behalten ihre fertigen Bilder (zlib-gepackt),
+    insgesamt höchstens max_bytes. Ältere Einträge behalten nur die Pfade und werden
+    bei Bedarf neu geladen. Mit executor wird im Hintergrund gepackt; bis dahin zählt
+    das ungepackte Bild.
+    """
+    
+    def __init__(self, max_entries=500, image_entries=30, max_bytes=16 * 1024 * 1024, executor=None):
+        self.max_entries = max_entries
+        self.image_entries = image_entries
+        self.max_bytes = max_bytes
+        self.executor = executor
+        self.entries = []
+        self.position = -1  # Index des gezeigten Eintrags
+        self.current_bytes = 0
+        self._lock = threading.RLock()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def push(self, paths, state=None):
+        """Neues Outfit hinter dem gezeigten anhängen (weiter vorne liegende Einträge fallen weg)"""
+        with self._lock:
+            for entry in self.entries[self.position + 1:]:
+                self._drop_images(entry)
+            del self.entries[self.position + 1:]
+            entry = HistoryEntry(paths, state)
+            self.entries.append(entry)
+            if len(self.entries) > self.max_entries:
+                self._drop_images(self.entries.pop(0))
+            self.position = len(self.entries) - 1
+            self._trim()
+            return entry
+    
+    def store_image(self, entry, slot, key, image):
+        """Fertiges Bild eines Platzes merken; key beschreibt Pfad und Einstellungen"""
+        with self._lock:
+            stored = entry.images.get(slot)
+            if stored is not None and stored[0] == key or entry not in self.entries:
+                return
+            if self.executor is None:
+                packed = pack_image(image)
+                self._replace(entry, slot, (key, packed, len(packed[2])))
+                return
+            # Vorerst ungepackt behalten, damit der Aufrufer (Tk-Thread) nicht warten muss
+            self._replace(entry, slot, (key, image, image.width * image.height * len(image.getbands())))
+        self.executor.submit(self._pack, entry, slot, key, image)
+    
+    def _pack(self, entry, slot, key, image):
+        packed = pack_image(image)
+        with self._lock:
+            stored = entry.images.get(slot)
+            if stored is not None and stored[1] is image:  # inzwischen nicht ersetzt oder verworfen
+                self._replace(entry, slot, (key, packed, len(packed[2])))
+    
+    def _replace(self, entry, slot, stored):
+        old = entry.images.get(slot)
+        if old is not None:
+            entry.nbytes -= old[2]
+            self.current_bytes -= old[2]
+        entry.images[slot] = stored
+        entry.nbytes += stored[2]
+        self.current_bytes += stored[2]
+        self._trim()
+    
+    def image(self, entry, slot, key):
+        """Gemerktes Bild (None, wenn es fehlt oder mit anderen Einstellungen erzeugt wurde)"""
+        with self._lock:
+            stored = entry.images.get(slot)
+        if stored is None or stored[0] != key:
+            return None
+        if isinstance(stored[1], Image.Image):
+            return stored[1]  # noch nicht gepackt
+        return unpack_image(stored[1])
+    
+    def _drop_images(self, entry):
+        self.current_bytes -= entry.nbytes
+        entry.images = {}
+        entry.nbytes = 0
+    
+    def _trim(self):
+        # Nur die neuesten Einträge (und der gezeigte) behalten ihre Bilder, und nur im Budget
+        current = self.entries[self.position] if self.entries else None
+        for entry in self.entries[:-self.image_entries] if self.image_entries else self.entries:
+            if entry.images and entry is not current:
+                self._drop_images(entry)
+        for entry in self.entries:
+            if self.current_bytes <= self.max_bytes:
+                break
+            if entry.images and entry is not current:
+                self._drop_images(entry)
+    
+    def current(self):
+        return self.entries[self.position] if self.entries else None
+    
+    def can_go_back(self):
+        return self.position > 0
+    
+    def can_go_forward(self):
+        return self.position < len(self.entries) - 1
+    
+    def back(self):
+        """Vorheriges Outfit (None am Anfang)"""
+        with self._lock:
+            if not self.can_go_back():
+                return None
+            self.position -= 1
+            return self.entries[self.position]
+    
+    def forward(self):
+        """Nächstes Outfit (None am Ende)"""
+        with self._lock:
+            if not self.can_go_forward():
+                return None
+            self.position += 1
+            return self.entries[self.position]
+    
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self.entries), 'with_images': sum(1 for entry in self.entries if entry.images),
+                    'bytes': self.current_bytes, 'max_bytes': self.max_bytes}
+
+
+def default_search_paths():
+    """Orte, an denen nach den Kategorie-Ordnern gesucht wird"""
+    return [
+        os.path.expanduser("~"),  # Home-Verzeichnis
+        os.path.expanduser("~/Desktop"),  # Desktop
+        os.path.expanduser("~/Documents"),  # Dokumente
+        os.path.expanduser("~/Pictures"),  # Bilder
+        "C:\\",  # C-Laufwerk (Windows)
+        "D:\\",  # D-Laufwerk (Windows)
+    ]
+
+
+def _skip_directory(entry):
+    """Versteckte Ordner und Systemordner werden nicht durchsucht"""
+    if entry.name.startswith(('.', '$')) or entry.name in SKIP_DIRECTORIES:
+        return True
+    attributes = getattr(entry.stat(follow_symlinks=False), 'st_file_attributes', 0)
+    return bool(attributes & _HIDDEN_OR_SYSTEM)
+
+
+def find_folders(search_paths=None, contains_images=None, max_depth=3, on_found=None):
+    """Intelligente Suche nach allen Ordnern
+    
+    Durchsucht alle Suchorte gleichzeitig Ebene für Ebene (Breitensuche) bis
+    max_depth und hört auf, sobald jede Kategorie gefunden ist. Unter den bis
+    dahin gefundenen Treffern gewinnt der frühere Suchort, dann der flachere Ordner.
+    on_found(Kategorie, Pfad) wird für jeden Treffer sofort aufgerufen.
+    """
+    if search_paths is None:
+        search_paths = default_search_paths()
+    if contains_images is None:
+        index = WardrobeIndex()
+        contains_images = lambda folder_path: len(index.folder(folder_path)) > 0
+    
+    # Ordnername -> (Kategorie, Rang des Namens in FOLDER_NAMES)
+    name_lookup = {}
+    for category, names in FOLDER_NAMES.items():
+        for rank, name in enumerate(names):
+            name_lookup.setdefault(name, (category, rank))
+    
+    best = {}  # Kategorie -> (Priorität, Pfad)
+    visited = set()
+    lock = threading.Lock()
+    done = threading.Event()
+    
+    def scan(root_index, search_path):
+        queue = deque([(search_path, 0)])
+        while queue and not done.is_set():
+            directory, depth = queue.popleft()
+            try:
+                with os.scandir(directory) as it:
+                    subdirs = [entry for entry in it if entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                continue  # Ordner ohne Berechtigung überspringen
+            
+            for entry in subdirs:
+                match = name_lookup.get(entry.name)
+                if match:
+                    category, rank = match
+                    priority = (root_index, depth, rank)
+                    with lock:
+                        better = category not in best or priority < best[category][0]
+                    # Prüfe ob Ordner Bilder enthält
+                    if better and contains_images(entry.path):
+                        with lock:
+                            if category not in best or priority < best[category][0]:
+                                best[category] = (priority, entry.path)
+                                print(f"Gefunden: {category} -> {entry.path}")
+                                if on_found:
+                                    on_found(category, entry.path)
+                            if len(best) == len(CATEGORIES):
+                                done.set()  # Alle gefunden, Suche beenden
+                
+                if depth + 1 < max_depth:
+                    try:
+                        if _skip_directory(entry):
+                            continue
+                        key = os.path.realpath(entry.path)
+                    except OSError:
+                        continue
+                    with lock:
+                        if key in visited:
+                            continue  # Schon über einen anderen Suchort erreicht
+                        visited.add(key)
+                    queue.append((entry.path, depth + 1))
+    
+    # Suchorte selbst gelten als besucht: liegt einer in einem anderen (Desktop im Home-Ordner),
+    # wird er nur von seiner eigenen Suche durchlaufen
+    roots = []
+    for path in search_paths:
+        if os.path.isdir(path) and os.path.realpath(path) not in visited:
+            visited.add(os.path.realpath(path))
+            roots.append(path)
+    if roots:
+        with ThreadPoolExecutor(max_workers=len(roots), thread_name_prefix='outfit-discovery') as pool:
+            list(pool.map(scan, range(len(roots)), roots))
+    
+    return {category: best[category][1] if category in best else None for category in CATEGORIES}
+
+
+def load_discovery_cache(search_paths=None, contains_images=None, cache_path=DISCOVERY_CACHE_FILE):
+    """Gespeicherte Ordner, falls sie noch existieren (sonst None)"""
+    if search_paths is None:
+        search_paths = default_search_paths()
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('search_paths') != list(search_paths):
+        return None  # Mit anderen Suchorten ermittelt
+    
+    folders = {}
+    for category in CATEGORIES:
+        entry = cached.get('folders', {}).get(category)
+        if entry is None:
+            # Fehlende Ordner wurden evtl. inzwischen angelegt: Pflicht-Kategorien immer neu
+            # suchen, die anderen, sobald sich ein Suchort geändert hat
+            if category in REQUIRED_CATEGORIES or cached.get('root_mtimes') != _root_mtimes(search_paths):
+                return None
+            folders[category] = None
+            continue
+        try:
+            mtime_ns = os.stat(entry['path']).st_mtime_ns
+        except (OSError, KeyError, TypeError):
+            return None  # Ordner verschwunden -> neu suchen
+        # Ordnerinhalt geändert: nur prüfen, ob noch Bilder darin sind
+        if mtime_ns != entry.get('mtime_ns') and contains_images and not contains_images(entry['path']):
+            return None
+        folders[category] = entry['path']
+    return folders
+
+
+def _root_mtimes(search_paths):
+    mtimes = []
+    for path in search_paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
+def save_discovery_cache(folders, search_paths=None, cache_path=DISCOVERY_CACHE_FILE):
+    """Speichert die gefundenen Ordner mit ihren Änderungszeiten"""
+    if search_paths is None:
+        search_paths = default_search_paths()
+    entries = {}
+    for category in CATEGORIES:
+        folder = folders.get(category)
+        try:
+            entries[category] = {'path': folder, 'mtime_ns': os.stat(folder).st_mtime_ns} if folder else None
+        except OSError:
+            entries[category] = None
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'search_paths': list(search_paths), 'root_mtimes': _root_mtimes(search_paths),
+                       'folders': entries}, f, indent=2)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Ordner-Cache konnte nicht gespeichert werden: {e}")
+
+
+def discover_folders(search_paths=None, contains_images=None, cache_path=DISCOVERY_CACHE_FILE,
+                     on_found=None):
+    """Ordner aus dem Cache laden oder (beim ersten Start) die Festplatte durchsuchen"""
+    folders = load_discovery_cache(search_paths, contains_images, cache_path)
+    if folders is None:
+        folders = find_folders(search_paths, contains_images, on_found=on_found)
+        save_discovery_cache(folders, search_paths, cache_path)
+    return folders
+
+
+def active_top_category(short_top=False, button_up=False):
+    """Aktive Top-Kategorie (Button Up vor Short Top vor Top)"""
+    if button_up:
+        return 'button_up'
+    elif short_top:
+        return 'short_top'
+    else:
+        return 'top'
+
+
+def active_bottom_category(short_bottom=False):
+    """Aktive Bottom-Kategorie"""
+    return 'short_bottom' if short_bottom else 'bottom'
+
+
+def outfit_slots(folders, layer=True, short_top=False, short_bottom=False, button_up=False):
+    """Ordner je Anzeige-Platz (top, layer, bottom, shoes) nach den Kategorie-Regeln"""
+    return (
+        ('top', folders.get(active_top_category(short_top, button_up))),
+        ('layer', folders.get('layer') if layer else None),
+        ('bottom', folders.get(active_bottom_category(short_bottom))),
+        ('shoes', folders.get('shoes')),
+    )
+
+
+def choose_outfit(slots, index, rng=random):
+    """Wählt für jeden Platz ein zufälliges Bild (Platz -> Pfad oder None)"""
+    return {slot: index.random_image(folder, rng) if folder else None for slot, folder in slots}
+
+
+def file_signature(image_path):
+    """Stand einer Datei (Änderungszeit, Größe) für Speicher-Caches; None, wenn sie fehlt"""
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def thumbnail_settings(max_width=SLOT_WIDTH, max_height=SLOT_HEIGHT, threshold=240,
+                       fill=(0, 0, 0), transparent=False):
+    """Alle Einstellungen, die das fertige Vorschaubild beeinflussen"""
+    return (max_width, max_height, threshold, tuple(fill), transparent)
+
+
+def pyramid_level(width, height):
+    """Kleinste Pyramiden-Stufe, die width x height abdeckt (sonst die größte)"""
+    for level in PYRAMID_LEVELS:
+        if level[0] >= width and level[1] >= height:
+            return level
+    return PYRAMID_LEVELS[-1]
+
+
+def fit_level(image, level, max_width, max_height):
+    """Skaliert ein Vorschaubild einer Pyramiden-Stufe auf höchstens max_width x max_height"""
+    scale = min(max_width / image.width, max_height / image.height)
+    if image.width < level[0] and image.height < level[1]:
+        scale = min(scale, 1.0)  # Original war kleiner als die Stufe: nicht vergrößern
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if size == image.size:
+        return image
+    return image.resize(size, Image.Resampling.LANCZOS if scale < 1 else Image.Resampling.BICUBIC)
+
+
+def load_thumbnail(image_path, settings, cache=None):
+    """Fertiges Vorschaubild als PIL-Bild, wenn möglich aus dem Cache"""
+    if cache is not None:
+        return cache.get(image_path, settings)
+    return prepare_thumbnail(image_path, settings)
+
+
+def compose_outfit(images, slot_width=SLOT_WIDTH, slot_height=SLOT_HEIGHT, background=(0, 0, 0)):
+    """Setzt die Bilder wie im Fenster zusammen: Top und Layer nebeneinander, darunter Bottom und Schuhe"""
+    padding, gap = 20, 10
+    width = 2 * padding + 2 * slot_width + 2 * gap
+    height = 2 * padding + 3 * slot_height + 2 * gap
+    canvas = Image.new('RGB', (width, height), tuple(background))
+    
+    def place(image, left, top, cell_width):
+        if image is None:
+            return
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        x = left + (cell_width - image.width) // 2
+        y = top + (slot_height - image.height) // 2
+        # Direkt auf RGB mit Alpha als Maske (gleiches Ergebnis wie alpha_composite, ohne Umwandlungen)
+        canvas.paste(image, (x, y), image if image.mode == 'RGBA' else None)
+    
+    full_width = width - 2 * padding
+    if images.get('layer') is not None:
+        half_width = (full_width - 2 * gap) // 2
+        place(images.get('top'), padding, padding, half_width)
+        place(images['layer'], width - padding - half_width, padding, half_width)
+    else:
+        place(images.get('top'), padding, padding, full_width)
+    place(images.get('bottom'), padding, padding + slot_height + gap, full_width)
+    place(images.get('shoes'), padding, padding + 2 * (slot_height + gap), full_width)
+    return canvas
+
+
+def render_outfit(outfit, settings, cache=None):
+    """Lädt alle Bilder eines Outfits und setzt sie zu einem Bild zusammen"""
+    images = {}
+    for slot, image_path in outfit.items():
+        if image_path:
+            try:
+                images[slot] = load_thumbnail(image_path, settings, cache)
+            except Exception as e:
+                print(f"Fehler beim Laden des Bildes {image_path}: {e}")
+    return compose_outfit(images, settings[0], settings[1])
+
+
+def generate_outfits(count, slots, index=None, seed=None, choose=None):
+    """Wählt count Outfits (mit seed reproduzierbar); choose(slots, rng) ersetzt die Zufallsauswahl"""
+    if index is None:
+        index = WardrobeIndex()
+    if choose is None:
+        def choose(slots, rng):
+            return choose_outfit(slots, index, rng)
+    rng = random.Random(seed)
+    return [choose(slots, rng) for _ in range(count)]
+
+
+# Cache pro Render-Prozess (wird vom Initializer angelegt)
+_worker_cache = None
+
+
+def _init_render_worker(cache_dir, max_bytes):
+    global _worker_cache
+    try:
+        _worker_cache = ThumbnailCache(cache_dir, max_bytes) if cache_dir else None
+    except OSError:
+        _worker_cache = None
+
+
+def _render_outfit_job(job):
+    """Rendert ein Outfit in eine Datei (läuft in einem eigenen Prozess)"""
+    outfit, settings, output_path = job
+    render_outfit(outfit, settings, _worker_cache).save(output_path)
+    return output_path
+
+
+def render_outfits(outfits, settings, output_dir, cache_dir=THUMBNAIL_CACHE_DIR,
+                   cache_bytes=200 * 1024 * 1024, workers=None, image_format='png', progress=None):
+    """Rendert alle Outfits parallel auf allen Kernen als Bilddateien"""
+    os.makedirs(output_dir, exist_ok=True)
+    digits = max(5, len(str(len(outfits))))
+    jobs = [(outfit, settings, os.path.join(output_dir, f"outfit_{number:0{digits}d}.{image_format}"))
+            for number, outfit in enumerate(outfits, 1)]
+    
+    paths = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_render_worker,
+                             initargs=(cache_dir, cache_bytes)) as pool:
+        for done, path in enumerate(pool.map(_render_outfit_job, jobs, chunksize=4), 1):
+            paths.append(path)
+            if progress:
+                progress(done, len(jobs))
+    return paths
@@ -0,0 +1,166 @@
+"""Fast gleiche Fotos im Kleiderschrank finden und aus der Auswahl nehmen
+
+Die Wahrnehmungs-Hashes (64-Bit-dHash) berechnet der Katalog-Abgleich einmal pro
+Bild auf allen Kernen. Ähnliche Hashes werden über eine Multi-Index-Hashtabelle
+gesucht statt jedes Paar zu vergleichen, Treffer werden zu Gruppen zusammengefasst.
+Pro Gruppe bleibt das größte Bild, die anderen werden mit --hide versteckt.
+
+Beispiele:
+    python outfit_dedupe.py                      # Bericht
+    python outfit_dedupe.py --distance 6 --json duplikate.json
+    python outfit_dedupe.py --hide               # Duplikate nicht mehr auswählen
+    python outfit_dedupe.py --unhide             # alle wieder zeigen
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import outfit_catalog
+import outfit_core
+
+# Höchstens so viele unterschiedliche Bits gelten als Duplikat (von 64)
+DEFAULT_DISTANCE = 4
+
+HASH_BITS = 64
+
+
+def hamming(a, b):
+    return ((a ^ b) & ((1 << HASH_BITS) - 1)).bit_count()
+
+
+class HashIndex:
+    """Multi-Index-Hashtabelle für die Suche nach Hashes mit kleinem Hamming-Abstand
+    
+    Der Hash wird in blocks Teile zerlegt. Liegen zwei Hashes höchstens max_distance
+    auseinander, unterscheiden sie sich in mindestens einem Teil um höchstens
+    max_distance // blocks Bits (Schubfachprinzip). Gesucht wird daher nur in den
+    Tabellen der Teile mit diesen wenigen gekippten Bits.
+    """
+    
+    def __init__(self, max_distance=DEFAULT_DISTANCE, blocks=4):
+        self.max_distance = max_distance
+        self.blocks = blocks
+        self.block_bits = HASH_BITS // blocks
+        self.radius = max_distance // blocks
+        self.hashes = []
+        self.tables = [{} for _ in range(blocks)]  # Teilwert -> Nummern der Hashes
+        # Alle Bitmuster mit höchstens radius gesetzten Bits innerhalb eines Teils
+        self.flips = [sum(1 << bit for bit in bits)
+                      for count in range(self.radius + 1)
+                      for bits in itertools.combinations(range(self.block_bits), count)]
+    
+    def _parts(self, value):
+        mask = (1 << self.block_bits) - 1
+        return [(value >> (block * self.block_bits)) & mask for block in range(self.blocks)]
+    
+    def add(self, value):
+        number = len(self.hashes)
+        self.hashes.append(value)
+        for table, part in zip(self.tables, self._parts(value)):
+            table.setdefault(part, []).append(number)
+        return number
+    
+    def search(self, value):
+        """Nummern aller Hashes mit höchstens max_distance unterschiedlichen Bits"""
+        candidates = set()
+        for table, part in zip(self.tables, self._parts(value)):
+            for flip in self.flips:
+                numbers = table.get(part ^ flip)
+                if numbers:
+                    candidates.update(numbers)
+        return [number for number in candidates if hamming(value, self.hashes[number]) <= self.max_distance]
+
+
+def find_clusters(hashes, max_distance=DEFAULT_DISTANCE):
+    """Gruppen (Listen von Nummern) fast gleicher Hashes, nur Gruppen mit mindestens zwei"""
+    index = HashIndex(max_distance)
+    parents = list(range(len(hashes)))
+    
+    def root(number):
+        while parents[number] != number:
+            parents[number] = parents[parents[number]]
+            number = parents[number]
+        return number
+    
+    # Jeder Hash sucht nur unter den schon eingefügten: jedes Paar wird einmal gefunden
+    for number, value in enumerate(hashes):
+        for other in index.search(value):
+            parents[root(number)] = root(other)
+        index.add(value)
+    
+    groups = {}
+    for number in range(len(hashes)):
+        groups.setdefault(root(number), []).append(number)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def duplicate_clusters(rows, max_distance=DEFAULT_DISTANCE):
+    """Duplikat-Gruppen je Ordner aus Katalog-Zeilen (Pfad, Ordner, Hash, Breite, Höhe, Größe)
+    
+    Rückgabe: Liste von Gruppen, jede nach Qualität sortiert (das zu behaltende Bild zuerst).
+    """
+    clusters = []
+    for _, folder_rows in itertools.groupby(rows, key=lambda row: row[1]):
+        folder_rows = list(folder_rows)
+        for group in find_clusters([row[2] for row in folder_rows], max_distance):
+            # Größte Auflösung, dann größte Datei, dann alphabetisch
+            members = sorted((folder_rows[number] for number in group),
+                             key=lambda row: (-(row[3] or 0) * (row[4] or 0), -row[5], row[0]))
+            clusters.append([{'path': path, 'width': width, 'height': height, 'size': size,
+                              'distance': hamming(members[0][2], phash)}
+                             for path, _, phash, width, height, size in members])
+    return sorted(clusters, key=lambda cluster: (-len(cluster), cluster[0]['path']))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Fast gleiche Fotos finden und aus der Auswahl nehmen")
+    parser.add_argument('search', nargs='*', help="Nur hier nach Kategorie-Ordnern suchen")
+    parser.add_argument('--distance', type=int, default=DEFAULT_DISTANCE,
+                        help=f"Höchstens so viele unterschiedliche Bits von {HASH_BITS} gelten als Duplikat")
+    parser.add_argument('--workers', type=int, default=None, help="Anzahl Prozesse (Standard: alle Kerne)")
+    parser.add_argument('--json', help="Gruppen als JSON speichern")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument('--hide', action='store_true', help="Duplikate nicht mehr auswählen (das beste Bild bleibt)")
+    action.add_argument('--unhide', action='store_true', help="Alle versteckten Duplikate wieder auswählen")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    folders = outfit_core.discover_folders(args.search or None)
+    catalog = outfit_catalog.Catalog()
+    
+    def report(done, total):
+        if done % 500 == 0 or done == total:
+            print(f"{done}/{total} Bilder analysiert", file=sys.stderr)
+    
+    start = time.perf_counter()
+    catalog.ingest(folders, workers=args.workers, progress=report)
+    rows = catalog.perceptual_hashes()
+    clusters = duplicate_clusters(rows, args.distance)
+    print(f"{len(rows)} Bilder, {len(clusters)} Gruppen mit "
+          f"{sum(len(cluster) - 1 for cluster in clusters)} Duplikaten ({time.perf_counter() - start:.1f} s)")
+    for cluster in clusters:
+        print(f"\n{os.path.dirname(cluster[0]['path'])}")
+        for number, item in enumerate(cluster):
+            mark = "behalten" if number == 0 else f"Abstand {item['distance']}"
+            print(f"  {os.path.basename(item['path'])}  {item['width']}x{item['height']}  ({mark})")
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'distance': args.distance, 'clusters': clusters}, f, indent=2, ensure_ascii=False)
+    if args.hide:
+        catalog.set_duplicates({item['path']: cluster[0]['path'] for cluster in clusters for item in cluster[1:]})
+        print("Duplikate werden nicht mehr ausgewählt")
+    elif args.unhide:
+        catalog.set_duplicates({})
+        print("Alle Bilder werden wieder ausgewählt")
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
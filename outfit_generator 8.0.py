@@ -1,9 +1,319 @@
+import time
+START_TIME = time.perf_counter()  # Für die Messung der Startzeit
+
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import os
-import random
-from PIL import Image, ImageTk, ImageOps
-import glob
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# PIL und der Outfit-Kern werden erst nach dem Öffnen des Fensters geladen (siehe load_modules)
+outfit_core = None
+outfit_catalog = None
+outfit_colors = None
+outfit_sampler = None
+Image = None
+ImageTk = None
+
+# Hier werden die Startzeiten jedes Programmstarts festgehalten
+STARTUP_LOG_FILE = os.path.join(os.path.expanduser("~"), ".outfit_generator", "startup_times.jsonl")
+
+# Standard-Ziel für die Zeitmessungen (OUTFIT_PERF=1), änderbar mit OUTFIT_PERF_TRACE
+PERF_TRACE_FILE = os.path.join(os.path.expanduser("~"), ".outfit_generator", "perf_trace.jsonl")
+
+# Platzbedarf einer Reihe im Canvas bei Plätzen von 250 x 180 (zwei nebeneinander samt Abständen);
+# die Reihen stehen untereinander im scrollbaren Canvas, in der Höhe muss nur eine passen
+SLOT_ROW_SIZE = (2 * 250 + 60, 180 + 40)
+
+
+def load_modules():
+    """Importiert PIL und den Outfit-Kern (dauert, deshalb im Hintergrund)"""
+    global outfit_core, outfit_catalog, outfit_colors, outfit_sampler, Image, ImageTk
+    if outfit_core is None:
+        from PIL import Image as pil_image, ImageTk as image_tk
+        import outfit_core as core
+        import outfit_catalog as catalog
+        import outfit_colors as colors
+        import outfit_sampler as sampler
+        Image = pil_image
+        ImageTk = image_tk
+        outfit_catalog = catalog
+        outfit_colors = colors
+        outfit_sampler = sampler
+        outfit_core = core
+
+# Anzeigetexte der Kategorien
+CATEGORY_TEXTS = {
+    'top': "👔 Top",
+    'layer': "🧥 Layer",
+    'bottom': "👖 Bottom",
+    'shoes': "👟 Schuhe",
+    'short_top': "👕 Short Top",
+    'short_bottom': "🩳 Short Bottom",
+    'button_up': "👔 Button Up"
+}
+
+# Auswahl-Modi (siehe outfit_sampler) und ihre Anzeigetexte
+DEFAULT_SAMPLER_MODE = 'shuffle'
+SAMPLER_TEXTS = {
+    'random': "🎲 Reiner Zufall",
+    'shuffle': "🔁 Keine Wiederholung bis alles dran war",
+    'recency': "🕒 Kürzlich Gezeigtes seltener"
+}
+
+# Rechtsklick auf ein Bild: wie oft es gezogen wird
+WEIGHT_CHOICES = [
+    ("⭐ Öfter zeigen", 3.0),
+    ("Normal", 1.0),
+    ("Seltener zeigen", 0.3),
+    ("🚫 Nie zeigen", 0.0)
+]
+
+class WardrobeBrowser:
+    """Virtualisiertes Raster aller Bilder eines Ordners im Scroll-Canvas
+    
+    Nur die sichtbaren Zeilen (plus etwas Reserve) haben Canvas-Elemente; diese werden
+    beim Scrollen wiederverwendet. Vorschaubilder laden im Hintergrund, sichtbare zuerst.
+    """
+    
+    CELL_WIDTH = 140
+    CELL_HEIGHT = 125
+    THUMB_WIDTH = 125
+    THUMB_HEIGHT = 90
+    OVERSCAN_ROWS = 2     # Reserve-Zeilen über und unter dem sichtbaren Bereich
+    MAX_LOADING = 8       # gleichzeitige Ladevorgänge
+    
+    def __init__(self, app):
+        self.app = app
+        self.canvas = app.canvas
+        self.active = False
+        self.paths = []
+        self.columns = 1
+        self.cells = []        # wiederverwendete Zellen: [Bild-Element, Text-Element, Index, Tk-Bild]
+        self.assigned = {}     # Index -> Zelle
+        self.wanted = []       # noch zu ladende Indizes, sichtbare zuerst
+        self.loading = set()   # Pfade, die gerade geladen werden
+        self.token = 0
+        self.photos = None     # LRU der fertigen Tk-Bilder (wird mit dem Outfit-Kern angelegt)
+    
+    def open(self, folder_path):
+        """Zeigt alle Bilder des Ordners an"""
+        if self.photos is None:
+            self.photos = outfit_core.MemoryLRUCache(max_bytes=16 * 1024 * 1024)
+        self.token += 1
+        self.active = True
+        self.paths = self.app.get_all_images(folder_path)
+        self.paths.sort(key=lambda path: os.path.basename(path).lower())
+        for cell in self.cells:
+            cell[2] = None
+        self.assigned = {}
+        self.relayout()
+        self.canvas.yview_moveto(0)
+        self.update()
+    
+    def close(self):
+        """Raster entfernen (Zellen und geladene Bilder werden freigegeben)"""
+        self.token += 1
+        self.active = False
+        for image_item, text_item, _, _ in self.cells:
+            self.canvas.delete(image_item)
+            self.canvas.delete(text_item)
+        self.cells, self.assigned, self.wanted, self.paths = [], {}, [], []
+        self.photos.clear()
+    
+    def relayout(self):
+        """Spaltenzahl und Scrollbereich an die Canvas-Breite anpassen"""
+        if not self.active:
+            return
+        width = max(self.canvas.winfo_width(), self.CELL_WIDTH)
+        columns = max(1, width // self.CELL_WIDTH)
+        rows = (len(self.paths) + columns - 1) // columns
+        self.canvas.configure(scrollregion=(0, 0, width, max(rows * self.CELL_HEIGHT, 1)))
+        if columns != self.columns:
+            self.columns = columns
+            for cell in self.cells:
+                cell[2] = None
+            self.assigned = {}
+        self.update()
+    
+    def update(self):
+        """Zellen den sichtbaren Bildern zuordnen (nach jedem Scrollen)"""
+        if not self.active:
+            return
+        top = int(self.canvas.canvasy(0))
+        height = self.canvas.winfo_height()
+        first_row = max(0, top // self.CELL_HEIGHT - self.OVERSCAN_ROWS)
+        last_row = (top + height) // self.CELL_HEIGHT + self.OVERSCAN_ROWS
+        first = first_row * self.columns
+        last = min(len(self.paths), (last_row + 1) * self.columns)
+        
+        # Zellen außerhalb des Bereichs freigeben und neu vergeben
+        for index in [index for index in self.assigned if not first <= index < last]:
+            self.assigned.pop(index)[2] = None
+        free = [cell for cell in self.cells if cell[2] is None]
+        for index in range(first, last):
+            if index in self.assigned:
+                continue
+            cell = free.pop() if free else self.new_cell()
+            self.show_cell(cell, index)
+        for cell in free:
+            cell[3] = None
+            self.canvas.itemconfigure(cell[0], state='hidden')
+            self.canvas.itemconfigure(cell[1], state='hidden')
+        
+        # Fehlende Bilder laden: erst der sichtbare Bereich von oben, dann die Reserve
+        visible_first = (top // self.CELL_HEIGHT) * self.columns
+        self.wanted = sorted((index for index in range(first, last)
+                              if self.photos.get(self.paths[index]) is None),
+                             key=lambda index: (index < visible_first, index), reverse=True)
+        self.pump()
+    
+    def new_cell(self):
+        image_item = self.canvas.create_image(0, 0, anchor='n')
+        text_item = self.canvas.create_text(0, 0, anchor='n', fill='lightgray', font=("Arial", 8))
+        cell = [image_item, text_item, None, None]
+        self.cells.append(cell)
+        return cell
+    
+    def show_cell(self, cell, index):
+        row, column = divmod(index, self.columns)
+        x = column * self.CELL_WIDTH + self.CELL_WIDTH // 2
+        y = row * self.CELL_HEIGHT + 4
+        path = self.paths[index]
+        cell[2], cell[3] = index, self.photos.get(path)  # Referenz behalten, auch wenn der LRU verdrängt
+        self.assigned[index] = cell
+        self.canvas.coords(cell[0], x, y)
+        self.canvas.coords(cell[1], x, y + self.THUMB_HEIGHT + 4)
+        self.canvas.itemconfigure(cell[0], image=cell[3] or '', state='normal')
+        self.canvas.itemconfigure(cell[1], text=os.path.basename(path)[:20], state='normal')
+    
+    def pump(self):
+        """Startet Ladevorgänge bis MAX_LOADING, Reihenfolge aus self.wanted"""
+        while self.wanted and len(self.loading) < self.MAX_LOADING:
+            index = self.wanted.pop()
+            path = self.paths[index]
+            if path in self.loading:
+                continue
+            self.loading.add(path)
+            future = self.app.image_pool.submit(self.app.load_thumbnail, path, self.THUMB_WIDTH, self.THUMB_HEIGHT)
+            future.add_done_callback(
+                lambda f, token=self.token, index=index, path=path: self.deliver(token, index, path, f))
+    
+    def deliver(self, token, index, path, future):
+        image = None if future.cancelled() else future.result()
+        try:
+            self.app.root.after(0, lambda: self.loaded(token, index, path, image))
+        except (RuntimeError, tk.TclError):
+            pass  # Fenster wurde bereits geschlossen
+    
+    def loaded(self, token, index, path, image):
+        """Ein Vorschaubild ist fertig (läuft im Tk-Thread)"""
+        self.loading.discard(path)
+        if token == self.token and image is not None:
+            photo = ImageTk.PhotoImage(image)
+            self.photos.put(path, photo, image.width * image.height * 4)
+            cell = self.assigned.get(index)
+            if cell is not None:
+                cell[3] = photo
+                self.canvas.itemconfigure(cell[0], image=photo)
+        if self.active:
+            self.pump()
+
+
+class SlotDisplay:
+    """Feste Tk-Bildpuffer je Platz, die nur noch per paste überschrieben werden
+    
+    Jeder Platz hat genau ein PhotoImage in Platzgröße. Neue Bilder werden mittig in
+    ein ebenso großes PIL-Bild gesetzt und in den Puffer kopiert, Lade- und Fehlertexte
+    liegen über dem Bild (compound='center'). Dadurch ändert sich die Größe der Labels
+    nie und es entstehen keine neuen Tk-Bilder. Alle Änderungen werden gesammelt und
+    in einem einzigen Idle-Callback gezeichnet. Angeheftete Plätze bekommen einen Rahmen
+    im Puffer selbst.
+    """
+    
+    IMAGE_BACKGROUND = (0, 0, 0)
+    PLACEHOLDER_BACKGROUND = (51, 51, 51)  # wie '#333333'
+    PIN_COLOR = (255, 193, 7)
+    PIN_WIDTH = 3
+    
+    def __init__(self, root, labels, width, height):
+        self.root = root
+        self.labels = labels    # Platz -> Label
+        self.size = (width, height)
+        self.photos = {}        # Platz -> PhotoImage in Platzgröße
+        self.frames = {}        # Platz -> PIL-Bild in Platzgröße (wird wiederverwendet)
+        self.shown = {}         # Platz -> gezeigtes PIL-Bild (None: Platzhalter)
+        self.styles = {}        # Platz -> (Text, Textfarbe, Hintergrund) des Labels
+        self.updates = {}       # Platz -> (PIL-Bild oder None, Text, Textfarbe)
+        self.pinned = set()     # Plätze mit Rahmen
+        self.dirty = set()      # Plätze, die auch bei gleichem Bild neu gezeichnet werden
+        self.job = None
+    
+    def resize(self, width, height):
+        """Neue Platzgröße: Puffer werden beim nächsten Zeichnen neu angelegt"""
+        self.size = (width, height)
+    
+    def show(self, slot, image, text="", fg='white'):
+        """Bild (oder mit image=None einen Platzhalter mit Text) für den nächsten Idle-Callback vormerken"""
+        self.updates[slot] = (image, text, fg)
+        if self.job is None:
+            self.job = self.root.after_idle(self.flush)
+    
+    def mark_pinned(self, slot, pinned):
+        """Rahmen für einen angehefteten Platz setzen oder entfernen (Layout bleibt gleich)"""
+        if pinned:
+            self.pinned.add(slot)
+        else:
+            self.pinned.discard(slot)
+        self.dirty.add(slot)
+        if slot not in self.updates:
+            text, fg = self.styles.get(slot, ("", 'white'))[:2]
+            self.show(slot, self.shown.get(slot), text, fg)
+    
+    def draw_border(self, frame):
+        width, height = frame.size
+        line = self.PIN_WIDTH
+        for box in ((0, 0, width, line), (0, height - line, width, height),
+                    (0, 0, line, height), (width - line, 0, width, height)):
+            frame.paste(self.PIN_COLOR, box)
+    
+    def allocate(self):
+        width, height = self.size
+        for slot, label in self.labels.items():
+            photo = ImageTk.PhotoImage('RGB', self.size, width=width, height=height)
+            self.photos[slot] = photo
+            self.frames[slot] = Image.new('RGB', self.size, self.PLACEHOLDER_BACKGROUND)
+            photo.paste(self.frames[slot])
+            label.configure(image=photo, compound='center')
+            label.image = photo  # Referenz behalten
+        self.shown = dict.fromkeys(self.labels)
+    
+    def flush(self):
+        """Alle vorgemerkten Änderungen zeichnen (läuft im Tk-Thread)"""
+        self.job = None
+        updates, self.updates = self.updates, {}
+        with outfit_core.perf.stage('slot_flush'):
+            if not self.frames or next(iter(self.frames.values())).size != self.size:
+                self.allocate()
+            for slot, (image, text, fg) in updates.items():
+                if image is not self.shown[slot] or slot in self.dirty:
+                    frame = self.frames[slot]
+                    frame.paste(self.IMAGE_BACKGROUND if image is not None else self.PLACEHOLDER_BACKGROUND,
+                                (0, 0) + frame.size)
+                    if image is not None:
+                        position = ((frame.width - image.width) // 2, (frame.height - image.height) // 2)
+                        frame.paste(image, position, image if image.mode == 'RGBA' else None)
+                    if slot in self.pinned:
+                        self.draw_border(frame)
+                    self.photos[slot].paste(frame)
+                    self.shown[slot] = image
+                    self.dirty.discard(slot)
+                style = (text, fg, '#000000' if image is not None else '#333333')
+                if self.styles.get(slot) != style:
+                    self.labels[slot].configure(text=text, fg=fg, bg=style[2])
+                    self.styles[slot] = style
+
 
 class OutfitGenerator:
     def __init__(self, root):
@@ -27,77 +337,199 @@ class OutfitGenerator:
         self.short_bottom_enabled = tk.BooleanVar(value=False)
         self.button_up_enabled = tk.BooleanVar(value=False)
         
-        # Unterstützte Bildformate
-        self.image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp', '*.gif']
+        # Farblich abgestimmte Auswahl statt reinem Zufall
+        self.coordinated_enabled = tk.BooleanVar(value=False)
+        
+        # Unterstützte Bildformate (werden mit dem Outfit-Kern geladen)
+        self.image_extensions = None
+        
+        # Bilderlisten, Caches und Prefetcher (werden im Hintergrund angelegt)
+        self.wardrobe_index = None
+        self.catalog = None
+        self.coordinator = None
+        self.sampling = None
+        self.thumbnail_cache = None
+        self.photo_cache = None
+        self.level_cache = None
+        self.level_builds = set()  # Pyramiden-Stufen, die gerade im Hintergrund entstehen
+        self.level_lock = threading.Lock()
+        self.prefetcher = None
         
-        # Automatisch nach Ordnern suchen
-        self.auto_find_folders()
+        # Verlauf der gezeigten Outfits und angeheftete Plätze (Platz -> Ordner beim Anheften)
+        self.history = None
+        self.current_entry = None
+        self.pins = {}
         
-        # GUI erstellen
+        # Größe eines Bild-Platzes, folgt der Fenstergröße (Start: 250 x 180)
+        self.slot_width = 250
+        self.slot_height = 180
+        self.resize_job = None
+        
+        # Hintergrund-Entfernung: Werte über dem Schwellenwert gelten als "weiß"
+        self.white_threshold = 240
+        self.background_fill = (0, 0, 0)  # Farbe für den entfernten Hintergrund
+        self.background_transparent = False  # True = Hintergrund durchsichtig statt Farbe
+        
+        # Hintergrund-Threads zum Laden der Bilder (PIL gibt beim Dekodieren die GIL frei)
+        self.image_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='outfit-image')
+        self.generation_token = 0  # Nur Ergebnisse der neuesten Generierung werden angezeigt
+        self.pending_loads = []
+        self.slots_loading = 0
+        
+        # Startzeiten (Fenster sichtbar, erstes Outfit angezeigt)
+        self.startup_times = {}
+        self.searching_folders = True
+        
+        # GUI sofort erstellen, Ordnersuche und erstes Outfit laufen im Hintergrund
         self.create_widgets()
+        self.browser = WardrobeBrowser(self)
+        self.root.bind('<Map>', self.window_mapped, add='+')
+        threading.Thread(target=self.background_startup, daemon=True).start()
+        
+    def background_startup(self):
+        """Lädt Module, sucht die Ordner und meldet sich dann beim Tk-Thread"""
+        finished = False
+        try:
+            load_modules()
+            self.load_engine()
+            self.auto_find_folders(on_found=lambda category, path: self.root.after(
+                0, lambda: self.folder_found(category, path)))
+            self.root.after(0, self.startup_finished)
+            finished = True
+            self.update_catalog()
+        except (RuntimeError, tk.TclError):
+            pass  # Fenster wurde während des Starts geschlossen
+        except Exception as e:
+            # Sonst blieben alle Buttons für immer gesperrt
+            print(f"Fehler beim Start: {e}")
+            try:
+                self.root.after(0, lambda error=e: self.startup_failed(error, finished))
+            except (RuntimeError, tk.TclError):
+                pass
+    
+    def startup_failed(self, error, finished):
+        """Fehler im Start-Thread anzeigen und die Oberfläche trotzdem freigeben"""
+        if not finished:
+            self.startup_finished()
+        self.status_label.configure(text=f"Fehler beim Start: {error}")
+    
+    def load_engine(self):
+        """Bilderlisten, Vorschaubild-Cache und Prefetcher anlegen"""
+        self.image_extensions = outfit_core.IMAGE_EXTENSIONS
         
-        # Automatisch ein Outfit beim Start generieren
-        self.root.after(500, self.auto_generate_on_startup)
+        # Bilderlisten der Ordner (einmal eingelesen, danach nur Änderungen)
+        self.wardrobe_index = outfit_core.WardrobeIndex(self.image_extensions, poll_interval=2.0)
         
-    def auto_find_folders(self):
-        """Intelligente Suche nach allen Ordnern"""
-        search_paths = [
-            os.path.expanduser("~"),  # Home-Verzeichnis
-            os.path.expanduser("~/Desktop"),  # Desktop
-            os.path.expanduser("~/Documents"),  # Dokumente
-            os.path.expanduser("~/Pictures"),  # Bilder
-            "C:\\",  # C-Laufwerk (Windows)
-            "D:\\",  # D-Laufwerk (Windows)
-        ]
+        # Festplatten-Cache für bearbeitete Vorschaubilder
+        try:
+            self.thumbnail_cache = outfit_core.ThumbnailCache(outfit_core.THUMBNAIL_CACHE_DIR,
+                                                              max_bytes=200 * 1024 * 1024)
+        except OSError as e:
+            print(f"Vorschaubild-Cache nicht verfügbar: {e}")
+            self.thumbnail_cache = None
         
-        folder_names = {
-            'top': ['Top', 'top', 'Tops', 'tops', 'Oberteile', 'oberteile'],
-            'layer': ['Layer', 'layer', 'Layers', 'layers', 'Jacken', 'jacken', 'Hoodies', 'hoodies'],
-            'bottom': ['Bottom', 'bottom', 'Bottoms', 'bottoms', 'Hosen', 'hosen', 'Unten', 'unten'],
-            'shoes': ['Shoes', 'shoes', 'Schuhe', 'schuhe', 'Footwear', 'footwear'],
-            'short_top': ['Short Top', 'short_top', 'Short_Top', 'ShortTop', 'Kurze Oberteile', 'kurze_oberteile', 'T-Shirts', 'tshirts'],
-            'short_bottom': ['Short Bottom', 'short_bottom', 'Short_Bottom', 'ShortBottom', 'Kurze Hosen', 'kurze_hosen', 'Shorts', 'shorts'],
-            'button_up': ['Button Up', 'button_up', 'Button_Up', 'ButtonUp', 'Hemden', 'hemden', 'Shirts', 'shirts', 'Blusen', 'blusen']
-        }
+        # Fertig skalierte Bilder für sofortige Wiederholungen (Budget in Bytes, nicht Anzahl);
+        # angezeigt werden sie durch Kopieren in die festen Puffer der Plätze
+        self.photo_cache = outfit_core.MemoryLRUCache(max_bytes=32 * 1024 * 1024)
         
-        found_folders = {
-            'top': None, 'layer': None, 'bottom': None, 'shoes': None,
-            'short_top': None, 'short_bottom': None, 'button_up': None
-        }
+        # Pyramiden-Stufen der Bilder: beim Ändern der Fenstergröße wird nur daraus skaliert
+        self.level_cache = outfit_core.MemoryLRUCache(max_bytes=48 * 1024 * 1024)
         
-        for search_path in search_paths:
-            if not os.path.exists(search_path):
-                continue
-                
+        # Gewichtete Auswahl ohne schnelle Wiederholungen (Verlauf wird beim Beenden gespeichert)
+        self.sampling = outfit_sampler.SamplingIndex(self.selection_index, mode=DEFAULT_SAMPLER_MODE)
+        
+        # Vorbereitete Outfits für sofortiges Anzeigen beim Klick
+        self.prefetcher = outfit_core.OutfitPrefetcher(self.image_pool, self.pick_outfit, self.load_thumbnail,
+                                                       depth=3, max_bytes=64 * 1024 * 1024,
+                                                       give_back=self.give_back_outfit)
+        
+        # Zurück/Vor: die letzten 30 Outfits mit fertigen Bildern (im Hintergrund gepackt), ältere nur als Pfade
+        self.history = outfit_core.OutfitHistory(max_entries=500, image_entries=30,
+                                                 max_bytes=16 * 1024 * 1024, executor=self.image_pool)
+    
+    def update_catalog(self):
+        """Katalog mit den Ordnern abgleichen (läuft im Hintergrund, bis dahin gilt die Bilderliste)"""
+        try:
+            if self.catalog is None:
+                self.catalog = outfit_catalog.Catalog()
+            analyzed, removed = self.catalog.ingest(self.get_folders())
+            if analyzed or removed:
+                print(f"Katalog: {analyzed} Bilder analysiert, {removed} entfernt")
+            if self.coordinator is None and outfit_colors.np is not None:
+                self.coordinator = outfit_colors.ColorCoordinator(self.catalog)
+        except (OSError, outfit_catalog.sqlite3.Error) as e:
+            print(f"Katalog nicht verfügbar: {e}")
+    
+    def selection_index(self, folder_path):
+        """Katalog, sobald der Ordner darin erfasst ist, sonst die Bilderliste"""
+        catalog = self.catalog
+        if catalog is not None and catalog.has_folder(folder_path):
+            return catalog
+        return self.wardrobe_index
+    
+    def toggle_perf(self, event=None):
+        """F12: Zeitmessung mit Anzeige ein-/ausschalten"""
+        if outfit_core is None:
+            return
+        outfit_core.perf.enabled = not outfit_core.perf.enabled
+        if outfit_core.perf.enabled:
+            self.show_perf_overlay()
+        else:
+            self.perf_label.pack_forget()
+    
+    def show_perf_overlay(self):
+        self.perf_label.pack(side='bottom', fill='x', before=self.canvas)
+        self.update_perf_overlay()
+    
+    def update_perf_overlay(self):
+        """Zeigt je Stufe die letzte Dauer und das 95. Perzentil (alle 500 ms)"""
+        if not outfit_core.perf.enabled:
+            return
+        lines = [f"{name:24s} letzte {entry['last']:7.1f} ms   p95 {entry['p95']:7.1f} ms"
+                 for name, entry in sorted(outfit_core.perf.summary().items())]
+        self.perf_label.configure(text="\n".join(lines) or "Noch keine Messungen")
+        self.root.after(500, self.update_perf_overlay)
+    
+    def folder_found(self, category, folder_path):
+        """Ein Kategorie-Ordner wurde gefunden (Status sofort aktualisieren)"""
+        setattr(self, f"{category}_folder", folder_path)
+        self.status_label.configure(text=self.get_folder_status())
+    
+    def startup_finished(self):
+        """Ordnersuche abgeschlossen: Buttons freigeben und erstes Outfit erzeugen"""
+        self.searching_folders = False
+        self.status_label.configure(text=self.get_folder_status())
+        self.folder_button.configure(state='normal')
+        self.generate_button.configure(state='normal')
+        self.warm_cache_button.configure(state='normal')
+        self.browse_button.configure(state='normal')
+        if outfit_colors is None or outfit_colors.np is None:
+            self.coordinated_checkbox.configure(state='disabled')  # ohne NumPy nicht verfügbar
+        if outfit_core is not None and outfit_core.perf.enabled:
+            self.show_perf_overlay()
+        self.auto_generate_on_startup()
+    
+    def window_mapped(self, event):
+        if event.widget is self.root and 'first_window' not in self.startup_times:
+            self.record_startup_time('first_window')
+    
+    def record_startup_time(self, name):
+        """Hält die Zeit seit Programmstart fest und schreibt sie ins Start-Protokoll"""
+        self.startup_times[name] = (time.perf_counter() - START_TIME) * 1000
+        print(f"Startzeit {name}: {self.startup_times[name]:.0f} ms")
+        if name == 'first_outfit':
             try:
-                # Durchsuche Unterordner bis zu 3 Ebenen tief
-                for root, dirs, files in os.walk(search_path):
-                    # Begrenze die Suchtiefe
-                    level = root.replace(search_path, '').count(os.sep)
-                    if level >= 3:
-                        dirs[:] = []  # Nicht tiefer gehen
-                        continue
-                    
-                    for folder_type, names in folder_names.items():
-                        if found_folders[folder_type] is None:
-                            for name in names:
-                                if name in dirs:
-                                    folder_path = os.path.join(root, name)
-                                    # Prüfe ob Ordner Bilder enthält
-                                    if self.folder_contains_images(folder_path):
-                                        found_folders[folder_type] = folder_path
-                                        print(f"Gefunden: {folder_type} -> {folder_path}")
-                                        break
-                    
-                    # Wenn alle gefunden, Suche beenden
-                    if all(found_folders.values()):
-                        break
-                        
-            except (PermissionError, OSError):
-                continue  # Ordner ohne Berechtigung überspringen
-                
-            if all(found_folders.values()):
-                break
+                os.makedirs(os.path.dirname(STARTUP_LOG_FILE), exist_ok=True)
+                with open(STARTUP_LOG_FILE, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'time': time.time(), **self.startup_times}) + '\n')
+            except OSError:
+                pass
+        
+    def auto_find_folders(self, on_found=None):
+        """Intelligente Suche nach allen Ordnern"""
+        # Gespeicherte Ordner prüfen, nur beim ersten Start die Festplatte durchsuchen
+        found_folders = outfit_core.discover_folders(contains_images=self.folder_contains_images,
+                                                     on_found=on_found)
         
         self.top_folder = found_folders['top']
         self.layer_folder = found_folders['layer']
@@ -110,10 +542,7 @@ class OutfitGenerator:
     def folder_contains_images(self, folder_path):
         """Prüft ob ein Ordner Bilder enthält"""
         try:
-            for extension in self.image_extensions:
-                if glob.glob(os.path.join(folder_path, extension)):
-                    return True
-            return False
+            return len(self.wardrobe_index.folder(folder_path)) > 0
         except:
             return False
         
@@ -143,22 +572,61 @@ class OutfitGenerator:
         self.status_label.pack(pady=5)
         
         # Button zum Ordner manuell auswählen (abgerundet)
-        folder_button = tk.Button(self.root, text="Ordner manuell auswählen", 
-                                 command=self.select_folders,
-                                 bg="#4CAF50", fg='white',
-                                 font=("Arial", 10, "bold"),
-                                 relief='flat',
-                                 bd=0,
-                                 padx=20, pady=8,
-                                 cursor='hand2')
-        folder_button.configure(highlightbackground='black')
-        folder_button.pack(pady=5)
+        self.folder_button = tk.Button(self.root, text="Ordner manuell auswählen", 
+                                      command=self.select_folders,
+                                      bg="#4CAF50", fg='white',
+                                      font=("Arial", 10, "bold"),
+                                      relief='flat',
+                                      bd=0,
+                                      padx=20, pady=8,
+                                      cursor='hand2')
+        self.folder_button.configure(highlightbackground='black', state='disabled')
+        self.folder_button.pack(pady=5)
+        
+        # Button zum Vorrendern aller Bilder in den Cache
+        self.warm_cache_button = tk.Button(self.root, text="⚡ Cache aufwärmen", 
+                                          command=self.warm_cache,
+                                          bg="#2196F3", fg='white',
+                                          font=("Arial", 10, "bold"),
+                                          relief='flat',
+                                          bd=0,
+                                          padx=20, pady=8,
+                                          cursor='hand2')
+        self.warm_cache_button.configure(highlightbackground='black', state='disabled')
+        self.warm_cache_button.pack(pady=5)
+        
+        # Button zum Durchsuchen einer Kategorie
+        self.browse_button = tk.Button(self.root, text="🗂 Kleiderschrank durchsuchen", 
+                                      command=self.toggle_browser,
+                                      bg="#9C27B0", fg='white',
+                                      font=("Arial", 10, "bold"),
+                                      relief='flat',
+                                      bd=0,
+                                      padx=20, pady=8,
+                                      cursor='hand2')
+        self.browse_button.configure(highlightbackground='black', state='disabled')
+        self.browse_button.pack(pady=5)
         
         # Kategorie-Schalter
         self.create_category_switches()
         
+        # Zurück/Vor im Verlauf links und rechts vom Generieren-Button
+        navigation_frame = tk.Frame(self.root, bg='black')
+        navigation_frame.pack(pady=15)
+        self.back_button = tk.Button(navigation_frame, text="◀", 
+                                    command=lambda: self.show_history(-1),
+                                    bg="#555555", fg='white',
+                                    font=("Arial", 12, "bold"),
+                                    relief='flat',
+                                    bd=0,
+                                    height=2,
+                                    padx=10,
+                                    cursor='hand2')
+        self.back_button.configure(highlightbackground='black', state='disabled')
+        self.back_button.pack(side='left', padx=(0, 8))
+        
         # Button zum Outfit generieren (abgerundet)
-        self.generate_button = tk.Button(self.root, text="🎲 Zufälliges Outfit generieren!", 
+        self.generate_button = tk.Button(navigation_frame, text="🎲 Zufälliges Outfit generieren!", 
                                         command=self.generate_outfit,
                                         bg="#FF6B35", fg='white',
                                         font=("Arial", 12, "bold"),
@@ -167,12 +635,31 @@ class OutfitGenerator:
                                         height=2,
                                         padx=20,
                                         cursor='hand2')
-        self.generate_button.configure(highlightbackground='black')
-        self.generate_button.pack(pady=15)
+        self.generate_button.configure(highlightbackground='black', state='disabled')
+        self.generate_button.pack(side='left')
+        
+        self.forward_button = tk.Button(navigation_frame, text="▶", 
+                                       command=lambda: self.show_history(1),
+                                       bg="#555555", fg='white',
+                                       font=("Arial", 12, "bold"),
+                                       relief='flat',
+                                       bd=0,
+                                       height=2,
+                                       padx=10,
+                                       cursor='hand2')
+        self.forward_button.configure(highlightbackground='black', state='disabled')
+        self.forward_button.pack(side='left', padx=(8, 0))
         
         # Scrollbares Frame für die Bilder
         self.create_scrollable_frame()
         
+        # Anzeige der Zeitmessung (nur sichtbar wenn eingeschaltet, F12)
+        self.perf_label = tk.Label(self.root, text="", font=("Courier", 8),
+                                  bg='black', fg='#7CFC00', justify=tk.LEFT, anchor='w')
+        self.root.bind('<F12>', self.toggle_perf)
+        self.root.bind('<Left>', lambda event: self.show_history(-1))
+        self.root.bind('<Right>', lambda event: self.show_history(1))
+        
     def create_category_switches(self):
         """Erstellt die Schalter für alle Kategorien"""
         switches_frame = tk.Frame(self.root, bg='black')
@@ -238,6 +725,88 @@ class OutfitGenerator:
                                                 cursor='hand2')
         self.button_up_checkbox.pack(pady=2)
         
+        # Farblich abgestimmt Schalter
+        self.coordinated_checkbox = tk.Checkbutton(switches_frame, 
+                                                  text="🎨 Farblich abgestimmt",
+                                                  variable=self.coordinated_enabled,
+                                                  command=lambda: self.toggle_category('coordinated'),
+                                                  bg='black', fg='white',
+                                                  selectcolor='#333333',
+                                                  activebackground='#444444',
+                                                  activeforeground='white',
+                                                  font=("Arial", 10),
+                                                  relief='flat',
+                                                  bd=0,
+                                                  cursor='hand2')
+        self.coordinated_checkbox.pack(pady=2)
+        
+        # Auswahl-Modus
+        self.sampler_mode = tk.StringVar(value=SAMPLER_TEXTS[DEFAULT_SAMPLER_MODE])
+        self.sampler_menu = tk.OptionMenu(switches_frame, self.sampler_mode, *SAMPLER_TEXTS.values(),
+                                          command=lambda text: self.change_sampler_mode())
+        self.sampler_menu.configure(bg='black', fg='white',
+                                    activebackground='#444444',
+                                    activeforeground='white',
+                                    font=("Arial", 10),
+                                    relief='flat',
+                                    bd=0,
+                                    highlightthickness=0,
+                                    cursor='hand2')
+        self.sampler_menu.pack(pady=2)
+        
+    def change_sampler_mode(self):
+        """Neuer Auswahl-Modus: vorbereitete Outfits verwerfen und neu generieren"""
+        mode = next(mode for mode, text in SAMPLER_TEXTS.items() if text == self.sampler_mode.get())
+        if self.sampling is None:
+            return
+        self.sampling.set_mode(mode)
+        self.prefetcher.invalidate()
+        if self.has_required_folders():
+            self.generate_outfit()
+    
+    def show_weight_menu(self, event):
+        """Rechtsklick auf ein Bild: festlegen, wie oft es gezogen wird, oder es anheften"""
+        image_path = getattr(event.widget, 'image_path', None)
+        if not image_path or self.sampling is None:
+            return
+        
+        menu = tk.Menu(self.root, tearoff=0)
+        menu.weight = tk.DoubleVar(value=self.sampling.weight(image_path))  # Referenz behalten
+        for text, weight in WEIGHT_CHOICES:
+            menu.add_radiobutton(label=text, value=weight, variable=menu.weight,
+                                 command=lambda weight=weight: self.set_image_weight(image_path, weight))
+        slot = next(slot for slot, label in self.slot_view.labels.items() if label is event.widget)
+        menu.add_separator()
+        menu.add_command(label="📌 Lösen" if slot in self.pins else "📌 Anheften, Rest neu würfeln",
+                         command=lambda: self.toggle_pin(slot))
+        menu.tk_popup(event.x_root, event.y_root)
+    
+    def toggle_pin(self, slot):
+        """Platz anheften: beim nächsten Würfeln bleibt sein Bild, nur die anderen ändern sich"""
+        if slot in self.pins:
+            del self.pins[slot]
+        else:
+            slots, _, _ = self.active_slots()
+            self.pins[slot] = dict(slots)[slot]
+        self.slot_view.mark_pinned(slot, slot in self.pins)
+    
+    def pinned_slots(self, slots):
+        """Angeheftete Plätze (Platz -> (Pfad, gezeigtes Bild)); wechselt der Ordner, endet das Anheften"""
+        pinned = {}
+        for slot, folder in slots:
+            if slot not in self.pins:
+                continue
+            image_path = getattr(self.slot_view.labels[slot], 'image_path', None)
+            if self.pins[slot] != folder or not image_path:
+                self.toggle_pin(slot)
+            else:
+                pinned[slot] = (image_path, self.slot_view.shown.get(slot))
+        return pinned
+    
+    def set_image_weight(self, image_path, weight):
+        self.sampling.set_weight(image_path, weight)
+        self.prefetcher.invalidate()  # vorbereitete Outfits kennen das neue Gewicht noch nicht
+    
     def toggle_category(self, activated_category):
         """Behandelt die Kategorie-Umschaltung mit spezifischer Exklusivität"""
         # Layer bleibt unberührt von anderen Kategorien
@@ -269,16 +838,19 @@ class OutfitGenerator:
         
         self.scrollable_frame.bind(
             "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            lambda e: self.browser.active or self.canvas.configure(scrollregion=self.canvas.bbox("all"))
         )
         
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.frame_window = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        self.canvas.configure(yscrollcommand=self.canvas_scrolled)
         
         # Pack Canvas und Scrollbar
         self.canvas.pack(side="left", fill="both", expand=True, pady=10)
         self.scrollbar.pack(side="right", fill="y", pady=10)
         
+        # Bildgröße folgt der Fenstergröße
+        self.canvas.bind('<Configure>', self.canvas_resized, add='+')
+        
         # Mausrad-Scrolling aktivieren
         self.bind_mousewheel()
         
@@ -318,6 +890,16 @@ class OutfitGenerator:
                                    pady=10)
         self.shoes_label.pack(pady=8, padx=20, fill='x')
         
+        # Rechtsklick auf ein Bild: Gewicht festlegen
+        for label in (self.top_label, self.layer_label, self.bottom_label, self.shoes_label):
+            label.bind('<Button-3>', self.show_weight_menu)
+        
+        # Feste Bildpuffer je Platz; Layout ändert sich nur, wenn der Layer ein-/ausgeblendet wird
+        self.slot_view = SlotDisplay(self.root, {'top': self.top_label, 'layer': self.layer_label,
+                                                 'bottom': self.bottom_label, 'shoes': self.shoes_label},
+                                     self.slot_width, self.slot_height)
+        self.layer_visible = True
+        
     def bind_mousewheel(self):
         """Bindet Mausrad-Scrolling an Canvas"""
         def _on_mousewheel(event):
@@ -368,6 +950,8 @@ class OutfitGenerator:
             if folder:
                 folder_name = os.path.basename(folder)
                 status += f"{name} ✓ {folder_name}\n"
+            elif self.searching_folders:
+                status += f"{name} ⏳ Wird gesucht...\n"
             else:
                 status += f"{name} ✗ Nicht gefunden\n"
                 
@@ -390,87 +974,209 @@ class OutfitGenerator:
             self.button_up_folder = filedialog.askdirectory(title="Button Up-Ordner auswählen")
             
         if self.has_required_folders():
+            if outfit_core is not None:  # sonst ist der Start fehlgeschlagen
+                outfit_core.save_discovery_cache(self.get_folders())
+                threading.Thread(target=self.update_catalog, daemon=True).start()
             messagebox.showinfo("Erfolg", "Mindestens die erforderlichen Ordner wurden ausgewählt!")
             # Status aktualisieren
             self.status_label.configure(text=self.get_folder_status())
         
+    def get_all_images(self, folder_path):
+        """Alle Bilder eines Ordners"""
+        return self.selection_index(folder_path).all_images(folder_path)
+    
     def get_random_image(self, folder_path):
         """Zufälliges Bild aus einem Ordner auswählen"""
-        if not folder_path or not os.path.exists(folder_path):
+        if not folder_path:
             return None
-            
-        all_images = []
-        for extension in self.image_extensions:
-            all_images.extend(glob.glob(os.path.join(folder_path, extension)))
-            
-        if not all_images:
-            return None
-            
-        return random.choice(all_images)
+        
+        # Aus Katalog/Index statt den Ordner bei jedem Klick neu zu durchsuchen
+        with outfit_core.perf.stage('get_random_image'):
+            return self.sampling.random_image(folder_path)
+    
+    def coordinated_pick(self, state):
+        """Farblich abgestimmt wählen, sobald der Katalog alle Ordner kennt"""
+        slots, coordinated = state
+        return coordinated and self.coordinator is not None and all(
+            self.catalog.has_folder(folder) for _, folder in slots if folder)
+    
+    def pick_outfit(self, state):
+        """Bildpfade je Platz: farblich abgestimmt (sobald der Katalog bereit ist) oder zufällig"""
+        slots, coordinated = state
+        if self.coordinated_pick(state):
+            with outfit_core.perf.stage('choose_coordinated'):
+                return self.coordinator.choose_outfit(slots)
+        return {slot: self.get_random_image(folder) if folder else None for slot, folder in slots}
+    
+    def give_back_outfit(self, state, outfit):
+        """Gezogene, aber nie gezeigte Bilder an die Auswahl zurückgeben (Shuffle: kommen noch dran)"""
+        if self.coordinated_pick(state):
+            return  # Farblich abgestimmte Outfits kommen nicht aus dem Sampler
+        for image_path, _ in outfit.values():
+            if image_path:
+                self.sampling.give_back(image_path)
     
     def remove_white_background(self, image):
         """Entfernt weißen Hintergrund und macht ihn schwarz/transparent"""
         try:
-            # Konvertiere zu RGBA wenn nötig
-            if image.mode != 'RGBA':
-                image = image.convert('RGBA')
-            
-            # Erstelle eine Kopie für die Bearbeitung
-            img_array = image.load()
-            width, height = image.size
-            
-            # Definiere Schwellenwerte für "weiß" (toleranter)
-            white_threshold = 240  # Werte über 240 gelten als "weiß"
-            
-            for x in range(width):
-                for y in range(height):
-                    r, g, b, a = img_array[x, y]
-                    
-                    # Prüfe ob Pixel "weiß" ist (alle RGB-Werte hoch)
-                    if r > white_threshold and g > white_threshold and b > white_threshold:
-                        # Mache weißen Hintergrund schwarz
-                        img_array[x, y] = (0, 0, 0, a)  # Schwarz mit ursprünglicher Alpha
-            
-            return image
-            
+            return outfit_core.remove_white_background(image, self.white_threshold,
+                                           self.background_fill, self.background_transparent)
         except Exception as e:
             print(f"Fehler beim Entfernen des weißen Hintergrunds: {e}")
             return image
     
-    def resize_image(self, image_path, max_width=250, max_height=180):
-        """Bild auf gewünschte Größe anpassen und weißen Hintergrund entfernen"""
+    def thumbnail_settings(self, max_width=None, max_height=None):
+        """Alle Einstellungen, die das fertige Vorschaubild beeinflussen (Standard: aktuelle Platzgröße)"""
+        return outfit_core.thumbnail_settings(max_width or self.slot_width, max_height or self.slot_height,
+                                              self.white_threshold, self.background_fill,
+                                              self.background_transparent)
+    
+    def load_thumbnail(self, image_path, max_width=None, max_height=None, fallback=False):
+        """Fertiges Vorschaubild als PIL-Bild (darf in Hintergrund-Threads laufen)
+        
+        Erzeugt wird die nächstgrößere Pyramiden-Stufe (Speicher, Festplatten-Cache
+        oder Original), angezeigt wird sie auf die gewünschte Größe skaliert. Mit
+        fallback wird eine fehlende Stufe nicht abgewartet: die nächstliegende
+        vorhandene wird skaliert und die richtige im Hintergrund erzeugt.
+        """
+        width, height = max_width or self.slot_width, max_height or self.slot_height
+        level = outfit_core.pyramid_level(width, height)
         try:
-            image = Image.open(image_path)
-            
-            # Entferne weißen Hintergrund
-            image = self.remove_white_background(image)
-            
-            # Größe anpassen
-            image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-            
-            return ImageTk.PhotoImage(image)
+            signature = outfit_core.file_signature(image_path)
+            with outfit_core.perf.stage('resize_image'):
+                image = self.cached_level(image_path, signature, level)
+                nearest = self.nearest_level(image_path, signature, level) if image is None and fallback else None
+                if nearest is not None:
+                    self.build_level_later(image_path, signature, level, (width, height))
+                    level, image = nearest
+                elif image is None:
+                    image = self.build_level(image_path, signature, level)
+            with outfit_core.perf.stage('fit_level'):
+                return outfit_core.fit_level(image, level, width, height)
         except Exception as e:
             print(f"Fehler beim Laden des Bildes {image_path}: {e}")
             return None
     
+    def cached_level(self, image_path, signature, level):
+        """Pyramiden-Stufe aus Speicher oder Festplatten-Cache (None, wenn sie erst erzeugt werden müsste)"""
+        settings = self.thumbnail_settings(*level)
+        image = self.level_cache.get((image_path, signature, settings))
+        if image is None and self.thumbnail_cache is not None:
+            image = self.thumbnail_cache.lookup(image_path, settings)
+            if image is not None:
+                self.level_cache.put((image_path, signature, settings), image, image.width * image.height * 4)
+        return image
+    
+    def nearest_level(self, image_path, signature, level):
+        """Vorhandene Stufe, die level am nächsten liegt, als (Stufe, Bild); bei Gleichstand die größere"""
+        position = outfit_core.PYRAMID_LEVELS.index(level)
+        others = sorted((other for other in outfit_core.PYRAMID_LEVELS if other != level),
+                        key=lambda other: (abs(outfit_core.PYRAMID_LEVELS.index(other) - position), -other[0]))
+        for other in others:
+            image = self.cached_level(image_path, signature, other)
+            if image is not None:
+                return other, image
+        return None
+    
+    def build_level(self, image_path, signature, level):
+        """Pyramiden-Stufe aus dem Original erzeugen (und in beiden Caches ablegen)"""
+        settings = self.thumbnail_settings(*level)
+        image = outfit_core.load_thumbnail(image_path, settings, self.thumbnail_cache)
+        self.level_cache.put((image_path, signature, settings), image, image.width * image.height * 4)
+        return image
+    
+    def build_level_later(self, image_path, signature, level, size):
+        """Fehlende Stufe im Hintergrund erzeugen; danach die Plätze mit dem Bild schärfer zeigen"""
+        key = (image_path, signature, level)
+        with self.level_lock:
+            if key in self.level_builds:
+                return
+            self.level_builds.add(key)
+        
+        def build():
+            try:
+                image = outfit_core.fit_level(self.build_level(image_path, signature, level), level, *size)
+            except Exception as e:
+                print(f"Fehler beim Laden des Bildes {image_path}: {e}")
+                return
+            finally:
+                with self.level_lock:
+                    self.level_builds.discard(key)
+            try:
+                self.root.after(0, lambda: self.level_built(image_path, size, image))
+            except (RuntimeError, tk.TclError):
+                pass  # Fenster wurde bereits geschlossen
+        
+        self.image_pool.submit(build)
+    
+    def level_built(self, image_path, size, image):
+        """Schärfere Stufe ist fertig: Plätze mit diesem Bild ersetzen (läuft im Tk-Thread)"""
+        if size != (self.slot_width, self.slot_height):
+            return  # Fenstergröße hat sich inzwischen wieder geändert
+        self.photo_cache.put(self.photo_key(image_path), image, image.width * image.height * 4)
+        for slot, label in self.slot_view.labels.items():
+            if getattr(label, 'image_path', None) == image_path and self.slot_view.shown.get(slot) is not None:
+                self.slot_view.show(slot, image)
+    
+    def resize_image(self, image_path, max_width=None, max_height=None):
+        """Bild auf gewünschte Größe anpassen und weißen Hintergrund entfernen"""
+        image = self.load_thumbnail(image_path, max_width, max_height)
+        if image is None:
+            return None
+        return ImageTk.PhotoImage(image)
+    
+    def warm_cache(self):
+        """Alle Bilder der gefundenen Ordner im Hintergrund vorrendern"""
+        if not self.thumbnail_cache:
+            messagebox.showerror("Fehler", "Der Vorschaubild-Cache ist nicht verfügbar.")
+            return
+        
+        image_paths = []
+        for folder in set(filter(None, self.get_folders().values())):
+            image_paths.extend(self.get_all_images(folder))
+        
+        def report(done, total):
+            self.root.after(0, lambda: self.warm_cache_button.configure(
+                text=f"⚡ Cache aufwärmen ({done}/{total})"))
+        
+        def run():
+            try:
+                level = outfit_core.pyramid_level(self.slot_width, self.slot_height)
+                outfit_core.warm_thumbnail_cache(self.thumbnail_cache, image_paths, self.thumbnail_settings(*level),
+                                                 report)
+            finally:
+                self.root.after(0, lambda: self.warm_cache_button.configure(
+                    text="⚡ Cache aufwärmen", state='normal'))
+        
+        self.warm_cache_button.configure(state='disabled')
+        threading.Thread(target=run, daemon=True).start()
+    
+    def get_folders(self):
+        """Alle Ordner-Pfade je Kategorie"""
+        return {
+            'top': self.top_folder, 'layer': self.layer_folder,
+            'bottom': self.bottom_folder, 'shoes': self.shoes_folder,
+            'short_top': self.short_top_folder, 'short_bottom': self.short_bottom_folder,
+            'button_up': self.button_up_folder
+        }
+    
     def get_active_top_category(self):
         """Gibt die aktive Top-Kategorie zurück"""
-        if self.button_up_enabled.get():
-            return ('button_up', self.button_up_folder, "👔 Button Up")
-        elif self.short_top_enabled.get():
-            return ('short_top', self.short_top_folder, "👕 Short Top")
-        else:
-            return ('top', self.top_folder, "👔 Top")
+        category = outfit_core.active_top_category(self.short_top_enabled.get(), self.button_up_enabled.get())
+        return (category, self.get_folders()[category], CATEGORY_TEXTS[category])
     
     def get_active_bottom_category(self):
         """Gibt die aktive Bottom-Kategorie zurück"""
-        if self.short_bottom_enabled.get():
-            return ('short_bottom', self.short_bottom_folder, "🩳 Short Bottom")
-        else:
-            return ('bottom', self.bottom_folder, "👖 Bottom")
+        category = outfit_core.active_bottom_category(self.short_bottom_enabled.get())
+        return (category, self.get_folders()[category], CATEGORY_TEXTS[category])
     
     def generate_outfit(self):
         """Zufälliges Outfit aus den Ordnern generieren"""
+        if self.prefetcher is None:
+            return  # Start läuft noch
+        if self.browser.active:
+            self.close_browser()
+        
         # Prüfen ob Mindestordner existieren (Top, Bottom, Schuhe)
         required_folders = [
             (self.top_folder, "Top"),
@@ -491,72 +1197,323 @@ class OutfitGenerator:
                                "entsprechende Ordner erstellen.")
             return
         
-        # Aktive Top-Kategorie ermitteln
-        top_category, top_folder, top_text = self.get_active_top_category()
-        top_image = self.get_random_image(top_folder)
+        start = time.perf_counter()
         
-        # Aktive Bottom-Kategorie ermitteln
-        bottom_category, bottom_folder, bottom_text = self.get_active_bottom_category()
-        bottom_image = self.get_random_image(bottom_folder)
+        slots, top_text, bottom_text = self.active_slots()
+        state = (slots, self.coordinated_enabled.get())
+        outfit = self.prefetcher.take(state)
+        prepared = bool(outfit)
+        if not prepared:
+            outfit = {slot: (image_path, None) for slot, image_path in self.pick_outfit(state).items()}
+        
+        # Angeheftete Plätze behalten ihr Bild, nur die anderen werden neu gewürfelt
+        pinned = self.pinned_slots(slots)
+        self.give_back_outfit(state, {slot: outfit[slot] for slot in pinned if outfit[slot][0] != pinned[slot][0]})
+        outfit.update(pinned)
         
-        # Schuhe (immer angezeigt)
-        shoes_image = self.get_random_image(self.shoes_folder)
+        # Im Verlauf merken (die Bilder kommen in show_image dazu, sobald sie da sind)
+        switches = {name: variable.get() for name, variable in self.category_switches().items()}
+        self.current_entry = self.history.push({slot: image_path for slot, (image_path, _) in outfit.items()},
+                                               (switches, top_text, bottom_text))
+        self.update_history_buttons()
+        
+        self.update_layer_visibility()
+        
+        # Bilder anzeigen: vorbereitetes Outfit sofort, sonst im Hintergrund laden
+        if prepared and not pinned:
+            self.display_prepared(outfit, top_text, bottom_text)
+        else:
+            self.display_images(outfit['top'][0], outfit['layer'][0], outfit['bottom'][0], outfit['shoes'][0],
+                                top_text, bottom_text,
+                                images={slot: image for slot, (_, image) in outfit.items() if image is not None})
+        
+        # Warteschlange für die nächsten Klicks auffüllen
+        self.prefetcher.fill()
+        outfit_core.perf.record('generate_outfit', (time.perf_counter() - start) * 1000)
+    
+    def active_slots(self):
+        """Ordner je Platz nach den Schaltern sowie die Texte für Top und Bottom"""
+        top_category, top_folder, top_text = self.get_active_top_category()
+        bottom_category, bottom_folder, bottom_text = self.get_active_bottom_category()
         
         # Layer (unabhängig von anderen)
-        layer_image = None
+        layer_folder = None
         if self.layer_enabled.get() and self.layer_folder and os.path.exists(self.layer_folder):
-            layer_image = self.get_random_image(self.layer_folder)
+            layer_folder = self.layer_folder
         
-        # Labels aktualisieren
-        self.top_label.configure(text=top_text)
-        self.bottom_label.configure(text=bottom_text)
+        slots = (('top', top_folder), ('layer', layer_folder),
+                 ('bottom', bottom_folder), ('shoes', self.shoes_folder))
+        return slots, top_text, bottom_text
+    
+    def category_switches(self):
+        """Schalter-Variablen nach Name (werden mit jedem Outfit im Verlauf gemerkt)"""
+        return {'layer': self.layer_enabled, 'short_top': self.short_top_enabled,
+                'short_bottom': self.short_bottom_enabled, 'button_up': self.button_up_enabled,
+                'coordinated': self.coordinated_enabled}
+    
+    def update_layer_visibility(self):
+        """Layer Label ein-/ausblenden (nur wenn sich etwas ändert, sonst rechnet Tk das Layout neu)"""
+        if self.layer_enabled.get() != self.layer_visible:
+            self.layer_visible = self.layer_enabled.get()
+            if self.layer_visible:
+                self.layer_label.pack(side='right', padx=(10, 0), fill='both', expand=True)
+            else:
+                self.layer_label.pack_forget()
+    
+    def update_history_buttons(self):
+        self.back_button.configure(state='normal' if self.history.can_go_back() else 'disabled')
+        self.forward_button.configure(state='normal' if self.history.can_go_forward() else 'disabled')
+    
+    def show_history(self, step):
+        """Vorheriges (step < 0) oder nächstes Outfit aus dem Verlauf zeigen
         
-        # Layer Label ein-/ausblenden
-        if self.layer_enabled.get():
-            self.layer_label.pack(side='right', padx=(10, 0), fill='both', expand=True)
-        else:
-            self.layer_label.pack_forget()
+        Gemerkte Bilder werden ohne Festplattenzugriff angezeigt; fehlen sie (ältere Einträge)
+        oder passen sie nicht mehr zur Platzgröße, wird wie beim Generieren geladen.
+        """
+        if self.history is None:
+            return
+        entry = self.history.back() if step < 0 else self.history.forward()
+        if entry is None:
+            return
+        if self.browser.active:
+            self.close_browser()
+        
+        # Schalter wie beim damaligen Outfit, Anheften gilt nur für das verlassene Outfit
+        switches, top_text, bottom_text = entry.state
+        for name, variable in self.category_switches().items():
+            variable.set(switches[name])
+        for slot in list(self.pins):
+            self.toggle_pin(slot)
+        self.current_entry = entry
+        self.update_history_buttons()
+        self.update_layer_visibility()
         
-        # Bilder anzeigen
-        self.display_images(top_image, layer_image, bottom_image, shoes_image, top_text, bottom_text)
+        paths = entry.paths
+        images = {}
+        for slot, image_path in paths.items():
+            image = self.history.image(entry, slot, self.photo_key(image_path)) if image_path else None
+            if image is not None:
+                images[slot] = image
+        self.display_images(paths['top'], paths['layer'], paths['bottom'], paths['shoes'],
+                            top_text, bottom_text, images=images)
+    
+    def canvas_scrolled(self, first, last):
+        """Sichtbarer Bereich des Canvas hat sich geändert"""
+        self.scrollbar.set(first, last)
+        if self.browser.active:
+            self.browser.update()
+    
+    def toggle_browser(self):
+        """Kategorie zum Durchsuchen wählen bzw. zurück zum Outfit"""
+        if self.browser.active:
+            self.close_browser()
+            return
+        menu = tk.Menu(self.root, tearoff=0)
+        for category, folder in self.get_folders().items():
+            if folder:
+                menu.add_command(label=CATEGORY_TEXTS[category],
+                                 command=lambda folder=folder: self.open_browser(folder))
+        menu.tk_popup(self.browse_button.winfo_rootx(),
+                      self.browse_button.winfo_rooty() + self.browse_button.winfo_height())
+    
+    def open_browser(self, folder_path):
+        """Outfit ausblenden und alle Bilder des Ordners als Raster zeigen"""
+        self.canvas.itemconfigure(self.frame_window, state='hidden')
+        self.browse_button.configure(text="⬅ Zurück zum Outfit")
+        self.browser.open(folder_path)
+    
+    def close_browser(self):
+        self.browser.close()
+        self.canvas.itemconfigure(self.frame_window, state='normal')
+        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.canvas.yview_moveto(0)
+        self.browse_button.configure(text="🗂 Kleiderschrank durchsuchen")
+    
+    def canvas_resized(self, event):
+        """Fenstergröße geändert: erst nach einer kurzen Pause neu skalieren (entprellt)"""
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+        self.resize_job = self.root.after(150, lambda: self.apply_slot_size(event.width, event.height))
+    
+    def apply_slot_size(self, canvas_width, canvas_height):
+        """Platzgröße an die Canvas-Größe anpassen und das aktuelle Outfit neu skalieren"""
+        if outfit_core is None:  # Start läuft noch
+            self.resize_job = self.root.after(150, lambda: self.apply_slot_size(canvas_width, canvas_height))
+            return
+        self.resize_job = None
+        self.browser.relayout()
+        # Feste Bezugsgröße statt der Startgröße: andere Bedienelemente (z.B. die Zeitmessung)
+        # ändern den Canvas, nicht die Plätze. Auf 10 % abgerundet, höchstens die größte Stufe
+        largest = outfit_core.PYRAMID_LEVELS[-1]
+        scale = min(canvas_width / SLOT_ROW_SIZE[0], canvas_height / SLOT_ROW_SIZE[1])
+        scale = max(0.5, min(int(scale * 10) / 10, largest[0] / 250, largest[1] / 180))
+        size = (round(250 * scale), round(180 * scale))
+        if size == (self.slot_width, self.slot_height):
+            return
+        self.slot_width, self.slot_height = size
+        self.slot_view.resize(*size)
+        if self.prefetcher is not None:
+            self.prefetcher.invalidate()  # vorbereitete Bilder haben noch die alte Größe
+            self.rescale_current()
+    
+    def rescale_current(self):
+        """Aktuelles Outfit in der neuen Größe zeigen (ohne Lade-Anzeige, aus der Pyramide)"""
+        token = self.start_generation()
+        for slot, label in self.slot_view.labels.items():
+            # Auch Plätze, die noch laden: ihr Ladevorgang wurde eben abgebrochen
+            image_path = getattr(label, 'image_path', None)
+            if not image_path or slot == 'layer' and not self.layer_visible:
+                continue
+            image = self.photo_cache.get(self.photo_key(image_path))
+            if image is not None:
+                self.slot_view.show(slot, image)
+                continue
+            future = self.image_pool.submit(self.load_thumbnail, image_path, fallback=True)
+            future.add_done_callback(
+                lambda f, image_path=image_path, slot=slot, category=label.category:
+                    self.deliver_image(token, f, image_path, slot, category))
+            self.pending_loads.append(future)
+        self.slots_loading = len(self.pending_loads)
     
-    def display_images(self, top_path, layer_path, bottom_path, shoes_path, top_category_text, bottom_category_text):
-        """Die Bilder in der GUI anzeigen"""
+    def start_generation(self):
+        """Neue Generierung: ältere, noch laufende Ladevorgänge verwerfen"""
+        self.generation_token += 1
+        for future in self.pending_loads:
+            future.cancel()
+        self.pending_loads = []
+        return self.generation_token
+    
+    def display_prepared(self, outfit, top_category_text, bottom_category_text):
+        """Ein bereits vorbereitetes Outfit ohne Laden anzeigen"""
+        token = self.start_generation()
+        slots = [
+            ('top', self.top_label, top_category_text),
+            ('layer', self.layer_label, "🧥 Layer"),
+            ('bottom', self.bottom_label, bottom_category_text),
+            ('shoes', self.shoes_label, "👟 Schuhe")
+        ]
+        
+        for slot, label, category in slots:
+            if category == "🧥 Layer" and not self.layer_enabled.get():
+                continue
+            image_path, image = outfit[slot]
+            label.image_path, label.category = image_path, category
+            if image_path:
+                self.show_image(token, image_path, image, slot, category)
+            else:
+                self.slot_view.show(slot, None, f"Kein Bild gefunden\n{category}", 'orange')
+        self.outfit_shown()
+    
+    def display_images(self, top_path, layer_path, bottom_path, shoes_path, top_category_text, bottom_category_text,
+                       images=None):
+        """Die Bilder in der GUI anzeigen (images: schon fertige Bilder je Platz, z.B. aus dem Verlauf)"""
+        start = time.perf_counter()
         images_data = [
-            (top_path, self.top_label, top_category_text),
-            (layer_path, self.layer_label, "🧥 Layer"),
-            (bottom_path, self.bottom_label, bottom_category_text),
-            (shoes_path, self.shoes_label, "👟 Schuhe")
+            ('top', top_path, self.top_label, top_category_text),
+            ('layer', layer_path, self.layer_label, "🧥 Layer"),
+            ('bottom', bottom_path, self.bottom_label, bottom_category_text),
+            ('shoes', shoes_path, self.shoes_label, "👟 Schuhe")
         ]
         
-        for image_path, label, category in images_data:
+        token = self.start_generation()
+        
+        for slot, image_path, label, category in images_data:
             # Layer überspringen wenn deaktiviert
             if category == "🧥 Layer" and not self.layer_enabled.get():
                 continue
-                
-            if image_path and os.path.exists(image_path):
-                photo = self.resize_image(image_path)
-                if photo:
-                    label.configure(image=photo, text="", compound='top')
-                    label.image = photo  # Referenz behalten
-                    # Hintergrund für Bild ändern
-                    label.configure(bg='#000000')
-                else:
-                    label.configure(image="", text=f"Fehler beim Laden\n{category}", 
-                                  bg='#333333', fg='lightcoral')
+            
+            label.image_path, label.category = image_path, category
+            image = images.get(slot) if images else None
+            if image is None and image_path:
+                image = self.photo_cache.get(self.photo_key(image_path))
+            if image is not None:
+                # Schon fertig im Speicher: sofort anzeigen
+                self.show_image(token, image_path, image, slot, category)
+            elif image_path:
+                # Ladezustand anzeigen, Bild im Hintergrund vorbereiten
+                self.slot_view.show(slot, None, f"⏳ Lädt...\n{category}", 'lightgray')
+                future = self.image_pool.submit(self.load_thumbnail, image_path)
+                future.add_done_callback(
+                    lambda f, image_path=image_path, slot=slot, category=category:
+                        self.deliver_image(token, f, image_path, slot, category))
+                self.pending_loads.append(future)
             else:
-                # Für Layer: Nur Fehlermeldung wenn aktiviert
-                if category == "🧥 Layer" and self.layer_enabled.get():
-                    label.configure(image="", text=f"Kein Bild gefunden\n{category}",
-                                  bg='#333333', fg='orange')
-                elif category != "🧥 Layer":
-                    label.configure(image="", text=f"Kein Bild gefunden\n{category}",
-                                  bg='#333333', fg='orange')
+                self.slot_view.show(slot, None, f"Kein Bild gefunden\n{category}", 'orange')
+        
+        self.slots_loading = len(self.pending_loads)
+        if not self.slots_loading:
+            self.outfit_shown()
+        outfit_core.perf.record('display_images', (time.perf_counter() - start) * 1000)
+    
+    def deliver_image(self, token, future, image_path, slot, category):
+        """Gibt ein fertig geladenes Bild an den Tk-Thread weiter"""
+        if future.cancelled() or token != self.generation_token:
+            return  # Veraltete Anfrage
+        image = future.result()
+        try:
+            self.root.after(0, lambda: self.slot_loaded(token, image_path, image, slot, category))
+        except (RuntimeError, tk.TclError):
+            pass  # Fenster wurde bereits geschlossen
+    
+    def slot_loaded(self, token, image_path, image, slot, category):
+        """Ein im Hintergrund geladenes Bild anzeigen (läuft im Tk-Thread)"""
+        if token != self.generation_token:
+            return
+        # Eine inzwischen fertige schärfere Stufe (level_built) hat Vorrang
+        self.show_image(token, image_path, image, slot, category)
+        self.slots_loading -= 1
+        if not self.slots_loading:
+            self.outfit_shown()
+    
+    def outfit_shown(self):
+        """Alle Bilder des aktuellen Outfits sind sichtbar"""
+        if 'first_outfit' not in self.startup_times:
+            self.record_startup_time('first_outfit')
+    
+    def photo_key(self, image_path):
+        """Schlüssel im Speicher-Cache: Pfad, Stand der Datei, Zielgröße und Bearbeitungs-Einstellungen"""
+        return (image_path, outfit_core.file_signature(image_path), self.thumbnail_settings())
+    
+    def show_image(self, token, image_path, image, slot, category):
+        """Zeigt ein geladenes Bild an (läuft im Tk-Thread)"""
+        if token != self.generation_token:
+            return  # Inzwischen wurde ein neues Outfit angefordert
+        
+        if image is not None:
+            key = self.photo_key(image_path)
+            cached = self.photo_cache.get(key)
+            if cached is None:
+                self.photo_cache.put(key, image, image.width * image.height * 4)
+            else:
+                image = cached
+            self.slot_view.show(slot, image)
+            if self.current_entry is not None:
+                self.history.store_image(self.current_entry, slot, key, image)
+        else:
+            self.slot_view.show(slot, None, f"Fehler beim Laden\n{category}", 'lightcoral')
 
 def main():
     root = tk.Tk()
     app = OutfitGenerator(root)
     root.mainloop()
+    
+    if app.sampling:
+        app.sampling.save()
+    
+    # Gesammelte Zeitmessungen als JSON-Lines speichern
+    if outfit_core is not None and outfit_core.perf.enabled:
+        trace_path = os.environ.get('OUTFIT_PERF_TRACE', PERF_TRACE_FILE)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            count = outfit_core.perf.export_jsonl(trace_path)
+            print(f"{count} Zeitmessungen gespeichert: {trace_path}")
+        except OSError as e:
+            print(f"Zeitmessungen konnten nicht gespeichert werden: {e}")
+    
+    if app.photo_cache:
+        stats = app.photo_cache.stats()
+        print(f"Bild-Cache: {stats['hits']} Treffer, {stats['misses']} Fehlschläge, "
+              f"{stats['evictions']} verdrängt, {stats['bytes'] / 1024 / 1024:.1f} MB belegt")
 
 if __name__ == "__main__":
     main()
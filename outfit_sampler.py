@@ -0,0 +1,401 @@
+"""Zufallsauswahl je Ordner: gewichtet, ohne schnelle Wiederholungen und mit gespeichertem Verlauf
+
+Modi:
+    random   gewichtet mit Zurücklegen
+    shuffle  jedes Bild einmal pro Durchgang (wie Karten mischen)
+    recency  gewichtet, kürzlich gezeigte Bilder werden seltener gezogen
+
+Jede Ziehung kostet O(1), auch bei 100.000 Bildern pro Ordner.
+"""
+import hashlib
+import os
+import random
+import struct
+import threading
+from array import array
+from collections import deque
+
+SAMPLER_MODES = ('random', 'shuffle', 'recency')
+
+# Verlauf und Gewichte je Ordner
+HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".outfit_generator", "history")
+
+# So viele letzte Ziehungen werden für die Wiederholungs-Bremse gemerkt
+RECENT_LIMIT = 256
+
+
+def item_key(image_path):
+    """64-Bit-Schlüssel eines Bildes für den gespeicherten Verlauf (nur der Dateiname zählt)"""
+    name = os.path.basename(image_path).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(name, digest_size=8).digest(), 'little')
+
+
+class AliasTable:
+    """Gewichtete Ziehung in O(1) (Vose-Alias-Methode)
+    
+    Änderungen bauen die Tabelle nicht sofort neu: entfernte Einträge werden beim
+    Ziehen verworfen, neue kommen in eine kleine Zusatzliste. Erst wenn beides
+    ein Viertel der Tabelle ausmacht, wird neu aufgebaut (amortisiert O(1)).
+    """
+    
+    def __init__(self, weights=None):
+        self.weights = dict(weights or {})
+        self._build()
+    
+    def _build(self):
+        items = [item for item, weight in self.weights.items() if weight > 0]
+        count = len(items)
+        total = sum(self.weights[item] for item in items)
+        prob = [self.weights[item] * count / total for item in items] if total else []
+        alias = list(range(count))
+        small = [i for i, p in enumerate(prob) if p < 1.0]
+        large = [i for i, p in enumerate(prob) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            alias[less] = more
+            prob[more] += prob[less] - 1.0
+            (small if prob[more] < 1.0 else large).append(more)
+        for i in small + large:
+            prob[i] = 1.0
+        
+        self.items = items
+        self.table_positions = {item: i for i, item in enumerate(items)}
+        self.prob = prob
+        self.alias = alias
+        self.table_total = total
+        self.dead = set()          # Einträge der Tabelle, die nicht mehr gelten
+        self.extra = []            # neue oder geänderte Einträge außerhalb der Tabelle
+        self.extra_positions = {}
+        self.extra_total = 0.0
+        self.extra_max = 0.0
+    
+    def __len__(self):
+        return len(self.items) - len(self.dead) + len(self.extra)
+    
+    def set(self, item, weight):
+        """Fügt hinzu, ändert das Gewicht oder entfernt (Gewicht 0)"""
+        if item in self.extra_positions:
+            self._remove_extra(item)
+        if item in self.table_positions:
+            self.dead.add(item)
+        if weight > 0:
+            self.weights[item] = weight
+        else:
+            self.weights.pop(item, None)
+        if weight > 0 and (item not in self.table_positions or item in self.dead):
+            self.extra_positions[item] = len(self.extra)
+            self.extra.append(item)
+            self.extra_total += weight
+            self.extra_max = max(self.extra_max, weight)  # obere Schranke, sinkt erst beim Neuaufbau
+        if len(self.dead) + len(self.extra) > max(16, len(self.items) // 4):
+            self._build()
+    
+    def remove(self, item):
+        self.set(item, 0)
+    
+    def rebuild(self, weights):
+        """Neuaufbau mit allen Gewichten auf einmal (für große Änderungen)"""
+        self.weights = {item: weight for item, weight in weights.items() if weight > 0}
+        self._build()
+    
+    def _remove_extra(self, item):
+        index = self.extra_positions.pop(item)
+        last = self.extra.pop()
+        if index < len(self.extra):
+            self.extra[index] = last
+            self.extra_positions[last] = index
+        self.extra_total -= self.weights[item]
+        if not self.extra:
+            self.extra_total = self.extra_max = 0.0
+    
+    def draw(self, rng=random):
+        """Ein Eintrag mit Wahrscheinlichkeit proportional zu seinem Gewicht (None wenn leer)"""
+        if not len(self):
+            return None
+        while True:
+            if self.extra and rng.random() * (self.table_total + self.extra_total) < self.extra_total:
+                # Zusatzliste per Verwerfungsverfahren (Gewicht / größtes Gewicht)
+                while True:
+                    item = self.extra[rng.randrange(len(self.extra))]
+                    if rng.random() * self.extra_max < self.weights[item]:
+                        return item
+            elif self.items:
+                i = rng.randrange(len(self.items))
+                item = self.items[i if rng.random() < self.prob[i] else self.alias[i]]
+                if item not in self.dead:
+                    return item
+
+
+class ShuffleBag:
+    """Jedes Bild einmal pro Durchgang; Gewicht w heißt im Mittel w Auftritte pro Durchgang"""
+    
+    def __init__(self):
+        self.bag = []
+        self.drawn = set()  # in diesem Durchgang schon gezogen
+    
+    def refill(self, weights, rng=random):
+        self.bag = []
+        self.drawn.clear()
+        for item, weight in weights.items():
+            copies = int(weight) + (rng.random() < weight - int(weight))
+            self.bag.extend([item] * copies)
+    
+    def add(self, item, weight, rng=random):
+        """Neues Bild kommt noch in diesem Durchgang dran"""
+        copies = int(weight) + (rng.random() < weight - int(weight))
+        self.bag.extend([item] * copies)
+    
+    def draw(self, weights, rng=random):
+        # Entfernte Bilder (oder Gewicht 0) bleiben bis zur Ziehung in der Tüte und werden dann übersprungen
+        for _ in range(8):
+            while self.bag:
+                index = rng.randrange(len(self.bag))
+                self.bag[index], self.bag[-1] = self.bag[-1], self.bag[index]
+                item = self.bag.pop()
+                if weights.get(item, 0) > 0:
+                    self.drawn.add(item)
+                    return item
+            self.refill(weights, rng)
+        return None
+
+
+class CategorySampler:
+    """Auswahl für einen Ordner in einem der SAMPLER_MODES"""
+    
+    # Verlaufsdatei: Kennung, Version, Ziehungen, dann Anzahl letzte/Durchgang/Gewichte
+    HEADER = struct.Struct('<4sIQIII')
+    MAGIC = b'OGHS'
+    VERSION = 1
+    
+    def __init__(self, mode='shuffle', recent_limit=RECENT_LIMIT):
+        self.mode = mode
+        self.recent_limit = recent_limit
+        self.weights = {}          # Bild -> Gewicht (nur vorhandene Bilder)
+        self.user_weights = {}     # Schlüssel -> vom Nutzer gesetztes Gewicht (auch für fehlende Bilder)
+        self.table = AliasTable()
+        self.bag = ShuffleBag()
+        self.recent = deque()      # letzte Ziehungen, älteste zuerst
+        self.last_seen = {}        # Bild -> Nummer seiner letzten Ziehung
+        self.draws = 0
+        self._saved_recent = []    # geladener Verlauf, bis die Bilder bekannt sind
+        self._saved_cycle = set()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.weights)
+    
+    def weight(self, item):
+        if not self.user_weights:
+            return 1.0
+        return self.user_weights.get(item_key(item), 1.0)
+    
+    def sync(self, items, rng=random):
+        """Gleicht die Bilder ab (nur Unterschiede werden eingearbeitet)"""
+        with self._lock:
+            current = set(items)
+            removed = [item for item in self.weights if item not in current]
+            added = [item for item in items if item not in self.weights]
+            bulk = len(removed) + len(added) > max(16, len(self.weights) // 4)
+            for item in removed:
+                del self.weights[item]
+                self.last_seen.pop(item, None)
+                if not bulk:
+                    self.table.remove(item)
+            for item in added:
+                weight = self.weight(item)
+                self.weights[item] = weight
+                if not bulk:
+                    self.table.set(item, weight)
+                if self.bag.bag or self.bag.drawn:
+                    self.bag.add(item, weight, rng)
+            if bulk:
+                self.table.rebuild(self.weights)
+            if added and (self._saved_recent or self._saved_cycle):
+                self._restore(added, rng)
+    
+    def set_weight(self, item, weight):
+        """Gewicht eines Bildes (1 = normal, 0 = nie); gilt im Shuffle-Modus ab dem nächsten Durchgang"""
+        with self._lock:
+            key = item_key(item)
+            if weight == 1.0:
+                self.user_weights.pop(key, None)
+            else:
+                self.user_weights[key] = weight
+            if item in self.weights:
+                self.weights[item] = weight
+                self.table.set(item, weight)
+    
+    def draw(self, rng=random):
+        """Nächstes Bild im eingestellten Modus (None wenn der Ordner leer ist)"""
+        with self._lock:
+            if self.mode == 'shuffle':
+                item = self.bag.draw(self.weights, rng)
+            elif self.mode == 'recency':
+                item = self._draw_recency(rng)
+            else:
+                item = self.table.draw(rng)
+            if item is not None:
+                self._remember(item)
+            return item
+    
+    def give_back(self, item):
+        """Nimmt die letzte Ziehung eines nie gezeigten Bildes zurück (z.B. verworfene vorbereitete Outfits)"""
+        with self._lock:
+            if item in self.bag.drawn:
+                self.bag.drawn.discard(item)
+                self.bag.bag.append(item)  # kommt in diesem Durchgang noch dran
+            for index in range(len(self.recent) - 1, -1, -1):
+                if self.recent[index] == item:
+                    del self.recent[index]
+                    if item not in self.recent:
+                        self.last_seen.pop(item, None)
+                    break
+    
+    def _draw_recency(self, rng):
+        # Vor kurzem gezogene Bilder werden mit Wahrscheinlichkeit Alter/Fenster angenommen
+        window = min(self.recent_limit, len(self.table) // 2)
+        item = None
+        for _ in range(32):
+            item = self.table.draw(rng)
+            age = self.draws - self.last_seen.get(item, -window)
+            if item is None or age >= window or rng.random() * window < age:
+                break
+        return item
+    
+    def _remember(self, item):
+        self.draws += 1
+        self.last_seen[item] = self.draws
+        self.recent.append(item)
+        if len(self.recent) > self.recent_limit:
+            old = self.recent.popleft()
+            if self.last_seen.get(old) == self.draws - self.recent_limit:
+                del self.last_seen[old]
+    
+    def _restore(self, items, rng):
+        # Gespeicherten Verlauf den nun bekannten Bildern zuordnen
+        by_key = {item_key(item): item for item in items}
+        start = self.draws - len(self._saved_recent)
+        for offset, key in enumerate(self._saved_recent, 1):
+            item = by_key.get(key)
+            if item is not None:
+                self.last_seen[item] = start + offset
+                self.recent.append(item)
+        while len(self.recent) > self.recent_limit:
+            self.recent.popleft()
+        if self._saved_cycle:
+            # Im gespeicherten Durchgang schon gezogene Bilder nicht erneut in die Tüte
+            self.bag.refill({item: weight for item, weight in self.weights.items()
+                             if weight > 0 and item_key(item) not in self._saved_cycle}, rng)
+            self.bag.drawn = {item for item in self.weights if item_key(item) in self._saved_cycle}
+        self._saved_recent, self._saved_cycle = [], set()
+    
+    def save(self, path):
+        """Verlauf und Gewichte kompakt speichern (8 Byte pro Eintrag)"""
+        with self._lock:
+            recent = array('Q', (item_key(item) for item in self.recent))
+            cycle = array('Q', (item_key(item) for item in self.bag.drawn))
+            keys = array('Q', self.user_weights.keys())
+            values = array('f', self.user_weights.values())
+            header = self.HEADER.pack(self.MAGIC, self.VERSION, self.draws, len(recent), len(cycle), len(keys))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            for values_array in (recent, cycle, keys, values):
+                f.write(values_array.tobytes())
+        os.replace(temp_path, path)
+    
+    def load(self, path):
+        """Gespeicherten Verlauf laden (vor dem ersten sync); False wenn keiner vorhanden ist"""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, version, draws, recent_count, cycle_count, weight_count = self.HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return False
+        if magic != self.MAGIC or version != self.VERSION:
+            return False
+        arrays, offset = [], self.HEADER.size
+        for typecode, count in (('Q', recent_count), ('Q', cycle_count), ('Q', weight_count), ('f', weight_count)):
+            values = array(typecode)
+            values.frombytes(data[offset:offset + count * values.itemsize])
+            offset += count * values.itemsize
+            arrays.append(values)
+        recent, cycle, keys, weights = arrays
+        with self._lock:
+            self.draws = draws
+            self._saved_recent = list(recent)
+            self._saved_cycle = set(cycle)
+            self.user_weights = dict(zip(keys, weights))
+        return True
+
+
+class SamplingIndex:
+    """Auswahl über CategorySampler statt gleichverteilt; gleiche Schnittstelle wie WardrobeIndex
+    
+    index_for(Ordner) liefert den Index mit den Bildern (WardrobeIndex oder Katalog).
+    """
+    
+    def __init__(self, index_for, mode='shuffle', history_dir=HISTORY_DIR):
+        self.index_for = index_for
+        self.mode = mode
+        self.history_dir = history_dir  # None: Verlauf nicht speichern
+        self.samplers = {}              # Ordner -> (Version des Index, CategorySampler)
+        self._lock = threading.Lock()
+    
+    def history_path(self, folder_path):
+        key = hashlib.sha1(os.path.abspath(folder_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.history_dir, f"{key}.bin")
+    
+    def sampler(self, folder_path, rng=random):
+        """Sampler eines Ordners, abgeglichen sobald sich die Bilder geändert haben"""
+        index = self.index_for(folder_path)
+        version = index.folder_version(folder_path)
+        with self._lock:
+            entry = self.samplers.get(folder_path)
+            if entry is None:
+                sampler = CategorySampler(self.mode)
+                if self.history_dir:
+                    sampler.load(self.history_path(folder_path))
+                entry = self.samplers[folder_path] = [None, sampler]
+        if entry[0] != version:
+            entry[1].sync(index.all_images(folder_path), rng)
+            entry[0] = version
+        return entry[1]
+    
+    def set_mode(self, mode):
+        with self._lock:
+            self.mode = mode
+            for _, sampler in self.samplers.values():
+                sampler.mode = mode
+    
+    def random_image(self, folder_path, rng=random):
+        return self.sampler(folder_path, rng).draw(rng)
+    
+    def all_images(self, folder_path):
+        return self.index_for(folder_path).all_images(folder_path)
+    
+    def give_back(self, image_path):
+        """Ziehung eines nie gezeigten Bildes zurücknehmen"""
+        with self._lock:
+            entry = self.samplers.get(os.path.dirname(image_path))
+        if entry is not None:
+            entry[1].give_back(image_path)
+    
+    def weight(self, image_path):
+        return self.sampler(os.path.dirname(image_path)).weight(image_path)
+    
+    def set_weight(self, image_path, weight):
+        self.sampler(os.path.dirname(image_path)).set_weight(image_path, weight)
+    
+    def save(self):
+        """Verlauf aller benutzten Ordner speichern"""
+        if not self.history_dir:
+            return
+        with self._lock:
+            samplers = [(folder, sampler) for folder, (_, sampler) in self.samplers.items()]
+        for folder, sampler in samplers:
+            try:
+                sampler.save(self.history_path(folder))
+            except OSError as e:
+                print(f"Verlauf konnte nicht gespeichert werden: {e}")
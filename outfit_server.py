@@ -0,0 +1,399 @@
+"""Outfits über HTTP für Kiosk-Bildschirm und Webseite (nur Standardbibliothek und Pillow)
+
+Beispiele:
+    python outfit_server.py --port 8765
+    curl 'http://127.0.0.1:8765/outfit?short_top=1&layer=0'
+    curl -o outfit.png 'http://127.0.0.1:8765/outfit.png?short_bottom=1'
+    python outfit_benchmark.py load --url http://127.0.0.1:8765/outfit.png
+
+Adressen:
+    /                    Seite mit einem Outfit und Knopf für das nächste (Parameter wie /outfit)
+    /outfit              Zufälliges Outfit als JSON (Pfade und Links zu den Vorschaubildern;
+                         mit embed=1 die PNG-Vorschaubilder als Base64 dazu)
+    /outfit.png|.jpg     Zufälliges Outfit als ein zusammengesetztes Bild
+    /render.png|.jpg     Bestimmtes Outfit als Bild (?top=ID&bottom=ID&..., IDs aus /outfit)
+    /thumbnail/ID.png    Fertiges Vorschaubild eines Kleidungsstücks
+    /stats               Zähler für Anfragen und Caches
+
+Die Kategorie-Regeln des Fensters gibt es als Parameter: layer (Standard 1),
+short_top, short_bottom, button_up und coordinated.
+"""
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import html
+import io
+import json
+import os
+import random
+import sys
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import outfit_cli
+import outfit_colors
+import outfit_core
+
+DEFAULT_PORT = 8765
+
+# Bildformate der Antworten: Endung -> (PIL-Format, Content-Type, Speicheroptionen)
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png', {'compress_level': 1}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 85}),
+}
+
+STATUS_TEXTS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# Obergrenze für Anfragezeile und Kopfzeilen
+MAX_HEADER_BYTES = 16 * 1024
+
+# Seite für Kiosk und Webseite: lädt /outfit als JSON und zeigt die Vorschaubilder wie im Fenster
+PAGE = """<!DOCTYPE html>
+<html lang="de">
+<head><meta charset="utf-8"><title>Outfit Generator</title>
+<style>
+body {{ background: #000; color: #fff; font-family: sans-serif; text-align: center; }}
+div {{ display: flex; justify-content: center; gap: 10px; margin: 10px; min-height: 180px; }}
+button {{ background: #4CAF50; color: #fff; border: 0; padding: 10px 20px; font-size: 16px; }}
+</style>
+</head>
+<body>
+<div><img id="top"><img id="layer"></div><div><img id="bottom"></div><div><img id="shoes"></div>
+<button onclick="next()">Outfit generieren</button>
+<script>
+async function next() {{
+  const outfit = (await (await fetch("/outfit?{query}")).json()).outfit;
+  for (const slot of ["top", "layer", "bottom", "shoes"]) {{
+    const image = document.getElementById(slot);
+    image.hidden = !outfit[slot];
+    if (outfit[slot]) image.src = outfit[slot].thumbnail;
+  }}
+}}
+next();
+</script>
+</body>
+</html>
+"""
+
+
+class HTTPError(Exception):
+    """Antwort mit Fehlerstatus"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def flag(query, name, default=False):
+    """Ja/Nein-Parameter (1, true, yes, on, ja)"""
+    values = query.get(name)
+    if not values:
+        return default
+    return values[-1].lower() in ('1', 'true', 'yes', 'on', 'ja')
+
+
+def encode_image(image, image_format):
+    """PIL-Bild -> Bytes im gewünschten Format"""
+    pil_format, _, options = IMAGE_FORMATS[image_format]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+class OutfitService:
+    """Outfit-Auswahl und Bildvorbereitung für viele gleichzeitige Anfragen
+    
+    Ausgewählt wird in der Ereignisschleife (O(1) im Index), Bildarbeit läuft im
+    Thread-Pool (Pillow gibt beim Dekodieren, Skalieren und Kodieren das GIL frei).
+    Fertige Bilder und kodierte Antworten liegen in gemeinsamen LRU-Caches; wird
+    dasselbe Bild gleichzeitig mehrfach angefragt, rechnet nur ein Job und alle
+    warten auf dessen Ergebnis.
+    """
+    
+    def __init__(self, folders, index, choose=None, executor=None, cache=None,
+                 settings=None, image_bytes=64 * 1024 * 1024, response_bytes=64 * 1024 * 1024):
+        self.folders = folders
+        self.index = index
+        self.choose = choose          # choose(slots, rng) für farblich abgestimmte Outfits
+        self.executor = executor
+        self.cache = cache            # ThumbnailCache auf der Festplatte (oder None)
+        self.settings = settings or outfit_core.thumbnail_settings()
+        self.images = outfit_core.MemoryLRUCache(image_bytes)        # fertige PIL-Vorschaubilder
+        self.responses = outfit_core.MemoryLRUCache(response_bytes)  # kodierte Bilder
+        self.in_flight = {}           # Schlüssel -> Future des laufenden Jobs
+        self.items = {}               # ID -> Pfad (nur ausgelieferte Bilder sind abrufbar)
+        self.counters = {'requests': 0, 'renders': 0, 'coalesced': 0, 'errors': 0}
+    
+    def item_id(self, image_path):
+        key = hashlib.sha1(image_path.encode('utf-8')).hexdigest()[:16]
+        self.items[key] = image_path
+        return key
+    
+    def slots(self, query):
+        """Ordner je Platz nach den Kategorie-Parametern"""
+        slots = outfit_core.outfit_slots(self.folders, layer=flag(query, 'layer', True),
+                                         short_top=flag(query, 'short_top'),
+                                         short_bottom=flag(query, 'short_bottom'),
+                                         button_up=flag(query, 'button_up'))
+        missing = [slot for slot, folder in slots if slot != 'layer' and not folder]
+        if missing:
+            raise HTTPError(503, f"Folgende Ordner fehlen: {', '.join(missing)}")
+        return slots
+    
+    async def pick(self, query):
+        """Zufälliges Outfit (Platz -> Pfad oder None)"""
+        slots = self.slots(query)
+        if self.choose is not None and flag(query, 'coordinated', True):
+            # Bewertung dauert einige Millisekunden und blockiert sonst alle Verbindungen
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.choose, slots, random)
+        return outfit_core.choose_outfit(slots, self.index)
+    
+    async def coalesced(self, cache, key, function, *args):
+        """Ergebnis aus dem Cache, sonst function(*args) im Pool (gleichzeitige Aufrufe teilen sich einen Job)"""
+        while True:
+            value = cache.get(key)
+            if value is not None:
+                return value
+            future = self.in_flight.get(key)
+            if future is None:
+                break
+            self.counters['coalesced'] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # diese Anfrage selbst wurde abgebrochen
+                # Die Anfrage mit dem Job wurde abgebrochen: der erste Wartende startet ihn neu
+        
+        loop = asyncio.get_running_loop()
+        future = self.in_flight[key] = loop.create_future()
+        try:
+            self.counters['renders'] += 1
+            value, nbytes = await loop.run_in_executor(self.executor, function, *args)
+            cache.put(key, value, nbytes)
+            future.set_result(value)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # als abgerufen markieren, falls niemand wartet
+            raise
+        finally:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+            if not future.done():
+                future.cancel()  # Anfrage abgebrochen: Wartende nicht hängen lassen
+        return value
+    
+    def _render_thumbnail(self, image_path):
+        image = outfit_core.load_thumbnail(image_path, self.settings, self.cache)
+        return image, image.width * image.height * 4
+    
+    def _encode(self, image, image_format):
+        data = encode_image(image, image_format)
+        return data, len(data)
+    
+    def _compose(self, images, image_format):
+        data = encode_image(outfit_core.compose_outfit(images, self.settings[0], self.settings[1]), image_format)
+        return data, len(data)
+    
+    @staticmethod
+    def image_key(image_path):
+        """Cache-Schlüssel eines Bildes (ändert sich mit der Datei)"""
+        try:
+            return image_path, os.stat(image_path).st_mtime_ns
+        except OSError:
+            raise HTTPError(404, f"Bild nicht gefunden: {os.path.basename(image_path)}")
+    
+    async def thumbnail(self, image_key):
+        """Fertiges Vorschaubild (PIL) eines Kleidungsstücks"""
+        return await self.coalesced(self.images, ('image',) + image_key, self._render_thumbnail, image_key[0])
+    
+    async def thumbnail_bytes(self, image_path, image_format='png'):
+        image_key = self.image_key(image_path)
+        image = await self.thumbnail(image_key)
+        return await self.coalesced(self.responses, ('thumbnail', image_format) + image_key,
+                                    self._encode, image, image_format)
+    
+    async def outfit_bytes(self, outfit, image_format):
+        """Zusammengesetztes Outfit-Bild"""
+        keys = {slot: self.image_key(path) for slot, path in outfit.items() if path}
+        images = await asyncio.gather(*(self.thumbnail(image_key) for image_key in keys.values()))
+        return await self.coalesced(self.responses, ('outfit', image_format, tuple(keys.items())),
+                                    self._compose, dict(zip(keys, images)), image_format)
+    
+    async def outfit_json(self, query):
+        outfit = await self.pick(query)
+        items = {}
+        for slot, path in outfit.items():
+            if path is None:
+                items[slot] = None
+                continue
+            key = self.item_id(path)
+            items[slot] = {'id': key, 'path': path, 'thumbnail': f"/thumbnail/{key}.png"}
+        if flag(query, 'embed'):
+            encoded = await asyncio.gather(*(self.thumbnail_bytes(item['path']) for item in items.values() if item))
+            for item, data in zip((item for item in items.values() if item), encoded):
+                item['png'] = base64.b64encode(data).decode('ascii')
+        render_query = urlencode({slot: item['id'] for slot, item in items.items() if item})
+        return {'outfit': items, 'image': f"/render.png?{render_query}"}
+    
+    def lookup(self, key):
+        path = self.items.get(key)
+        if path is None:
+            raise HTTPError(404, f"Unbekanntes Bild: {key}")
+        return path
+    
+    async def handle(self, path, query):
+        """(Status, Content-Type, Bytes) für eine GET-Anfrage"""
+        name, dot, extension = path.rpartition('.')
+        if not dot or '/' in extension:
+            name, extension = path, ''
+        
+        if path == '/':
+            page_query = urlencode({key: values[-1] for key, values in query.items()})
+            page = PAGE.format(query=html.escape(page_query))
+            return 200, 'text/html; charset=utf-8', page.encode('utf-8')
+        if path == '/outfit':
+            body = await self.outfit_json(query)
+            return 200, 'application/json', json.dumps(body, ensure_ascii=False).encode('utf-8')
+        if path == '/stats':
+            body = dict(self.counters, images=self.images.stats(), responses=self.responses.stats(),
+                        in_flight=len(self.in_flight), items=len(self.items))
+            return 200, 'application/json', json.dumps(body).encode('utf-8')
+        if extension in IMAGE_FORMATS:
+            content_type = IMAGE_FORMATS[extension][1]
+            if name == '/outfit':
+                return 200, content_type, await self.outfit_bytes(await self.pick(query), extension)
+            if name == '/render':
+                outfit = {slot: self.lookup(query[slot][-1]) for slot in ('top', 'layer', 'bottom', 'shoes')
+                          if slot in query}
+                return 200, content_type, await self.outfit_bytes(outfit, extension)
+            if name.startswith('/thumbnail/'):
+                image_path = self.lookup(name[len('/thumbnail/'):])
+                return 200, content_type, await self.thumbnail_bytes(image_path, extension)
+        raise HTTPError(404, f"Unbekannte Adresse: {path}")
+
+
+async def read_request(reader):
+    """(Methode, Ziel, Kopfzeilen) einer Anfrage oder None, wenn die Verbindung zu ist"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(400, "Kopfzeilen zu lang")
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise HTTPError(400, "Ungültige Anfragezeile")
+    headers = {'_version': version}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+def response_head(status, content_type, length, keep_alive):
+    return (f"HTTP/1.1 {status} {STATUS_TEXTS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {length}\r\n"
+            f"Cache-Control: no-store\r\n"
+            f"Access-Control-Allow-Origin: *\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1')
+
+
+async def serve_connection(service, reader, writer):
+    """Beantwortet Anfragen einer Verbindung nacheinander (Keep-Alive)"""
+    try:
+        while True:
+            method, keep_alive = 'GET', False
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (headers['_version'] == 'HTTP/1.1' or connection == 'keep-alive')
+                if method not in ('GET', 'HEAD'):
+                    raise HTTPError(405, f"Methode nicht erlaubt: {method}")
+                url = urlsplit(target)
+                service.counters['requests'] += 1
+                status, content_type, body = await service.handle(url.path, parse_qs(url.query))
+            except HTTPError as e:
+                service.counters['errors'] += 1
+                status, content_type, body = e.status, 'text/plain; charset=utf-8', str(e).encode('utf-8')
+            except Exception as e:
+                service.counters['errors'] += 1
+                print(f"Fehler bei der Anfrage: {e}", file=sys.stderr)
+                status, content_type, body = 500, 'text/plain; charset=utf-8', str(e).encode('utf-8')
+            
+            writer.write(response_head(status, content_type, len(body), keep_alive))
+            if method != 'HEAD':
+                writer.write(body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host, port, ready=None):
+    """Startet den Server und läuft bis zum Abbruch"""
+    server = await asyncio.start_server(lambda reader, writer: serve_connection(service, reader, writer),
+                                        host, port, limit=MAX_HEADER_BYTES, backlog=512)
+    address = server.sockets[0].getsockname()
+    print(f"Outfit-Server läuft auf http://{address[0]}:{address[1]}/", file=sys.stderr, flush=True)
+    if ready:
+        ready(address)
+    async with server:
+        await server.serve_forever()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Zufällige Outfits als JSON oder Bild über HTTP")
+    parser.add_argument('--host', default='127.0.0.1', help="Adresse (0.0.0.0 für alle Netzwerke)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Port")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Threads für die Bildvorbereitung (Standard: Kerne + 4)")
+    parser.add_argument('--no-cache', action='store_true', help="Vorschaubild-Cache nicht verwenden")
+    outfit_cli.add_selection_options(parser)
+    # Kiosk: möglichst lange keine Wiederholungen
+    parser.set_defaults(sampler='shuffle')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    folders = outfit_cli.resolve_folders(args.folder, args.search)
+    if args.coordinated and outfit_colors.np is None:
+        print("--coordinated braucht NumPy (pip install numpy)", file=sys.stderr)
+        return 1
+    index, choose = outfit_cli.build_index(args, folders)
+    
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = outfit_core.ThumbnailCache()
+        except OSError as e:
+            print(f"Cache nicht verfügbar: {e}", file=sys.stderr)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.threads or (os.cpu_count() or 1) + 4,
+                                               thread_name_prefix='outfit-server') as executor:
+        service = OutfitService(folders, index, choose, executor, cache)
+        try:
+            asyncio.run(serve(service, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Tests für den Outfit-Kern (python -m unittest oder python -m pytest)"""
+import random
+import unittest
+from collections import deque
+
+from PIL import Image
+
+import outfit_core
+
+
+def border_connected_bfs(mask):
+    """Referenz: Breitensuche von allen weißen Randpixeln aus (4er-Nachbarschaft)"""
+    width, height = mask.size
+    data = mask.tobytes()
+    result = bytearray(width * height)
+    queue = deque()
+    for y in range(height):
+        for x in range(width):
+            if (x in (0, width - 1) or y in (0, height - 1)) and data[y * width + x]:
+                result[y * width + x] = 255
+                queue.append((x, y))
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= nx < width and 0 <= ny < height and data[ny * width + nx] and not result[ny * width + nx]:
+                result[ny * width + nx] = 255
+                queue.append((nx, ny))
+    return bytes(result)
+
+
+def random_masks(count, seed=5):
+    """Zufällige Masken aller Dichten, auch einzeilige und -spaltige"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        width, height = rng.randint(1, 60), rng.randint(1, 60)
+        density = rng.random()
+        data = bytes(255 if rng.random() < density else 0 for _ in range(width * height))
+        yield Image.frombytes('L', (width, height), data)
+
+
+def ring_mask():
+    """Weißer Rand, schwarzer Ring, weiße Insel in der Mitte (muss erhalten bleiben)"""
+    mask = Image.new('L', (40, 30), 255)
+    mask.paste(0, (5, 5, 35, 25))
+    mask.paste(255, (10, 10, 30, 20))
+    return mask
+
+
+class BorderConnectedTest(unittest.TestCase):
+    """Beide Umsetzungen der Flutfüllung müssen dieselbe Maske liefern wie eine Breitensuche"""
+    
+    def setUp(self):
+        self.numpy = outfit_core.np
+    
+    def tearDown(self):
+        outfit_core.np = self.numpy
+    
+    def check(self, border_connected):
+        for mask in [ring_mask(), *random_masks(300)]:
+            with self.subTest(size=mask.size):
+                self.assertEqual(border_connected(mask).tobytes(), border_connected_bfs(mask))
+    
+    def test_pure_python(self):
+        outfit_core.np = None
+        self.check(outfit_core.border_connected)
+    
+    @unittest.skipIf(outfit_core.np is None, "NumPy nicht installiert")
+    def test_numpy(self):
+        self.check(outfit_core._border_connected_numpy)
+    
+    def test_enclosed_white_stays(self):
+        outfit_core.np = None
+        result = outfit_core.border_connected(ring_mask())
+        self.assertEqual(result.getpixel((0, 0)), 255)
+        self.assertEqual(result.getpixel((20, 15)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()